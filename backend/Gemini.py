@@ -1,16 +1,89 @@
+import asyncio
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from admission import (ADMISSION, AsyncConcurrencyLimiter, CircuitBreaker, CircuitOpen, ConcurrencyLimiter,
+                       Overloaded, RetryPolicy, is_transient, register_breaker)
+from config_watcher import ConfigWatcher
+from conversation import ConversationMemory
 from eco_personality import EcoPersonality
+from impact_ledger import get_impact_ledger
+from metrics import (COMMANDS, MODEL_CALLS, MODEL_ERRORS, QUIZ_ANSWERS, REQUEST_SECONDS,
+                     STAGE_SECONDS, register_cache)
+from model_providers import ModelTimeout, create_provider
+from response_cache import ResponseCache, create_response_cache
+from session_store import SessionConflict
+from singleflight import SingleFlight, register_singleflight
 import time
 from pathlib import Path
 
+ENV_PATH = Path(__file__).parent / 'API.env'
+_env_loaded = False
+
+
+def load_env():
+    """Load API.env into the environment once per process (variables already set win)"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    print(f"🌲 正在加载环境文件: {ENV_PATH}")
+    if ENV_PATH.exists():
+        from dotenv import load_dotenv  # 没有文件就不必导入
+        load_dotenv(ENV_PATH)
+        print("🌲 环境变量加载成功")
+
+
 class EcoAISystem:
-    def __init__(self):
-        """初始化熊大AI系统"""
+    IMPACT_COMMANDS = ("my impact", "我的贡献")
+
+    def __init__(self, model=None, cache=None):
+        """初始化熊大AI系统（模型后端第一次用到时才创建，见 model）"""
+        load_env()
+        # 减排量、答题成绩写入持久化账本（ECO_LEDGER=0 时只记在会话里）
+        self.ledger = get_impact_ledger() if os.getenv("ECO_LEDGER", "1") != "0" else None
         self.persona = self._init_personality()
-        self.model = self._init_gemini()
+        # 修改 eco_ai_character.json 后自动重新编译并替换（ECO_CONFIG_RELOAD_SECONDS=0 关闭）
+        self.config_watcher = ConfigWatcher(
+            self.persona.config_path,
+            build=lambda path: EcoPersonality(path, strict=True, ledger=self.ledger),
+            on_reload=self.reload_personality,
+            interval=float(os.getenv("ECO_CONFIG_RELOAD_SECONDS", "2"))
+        ).start()
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.model_error = None  # 最近一次创建模型失败的原因
+        self.cache = cache if cache is not None else create_response_cache()
+        register_cache(self.cache)
+        # 同一问题正在问模型时，后来的请求等这一次的结果（ECO_COALESCE=0 关闭）
+        self.flights = SingleFlight(enabled=os.getenv("ECO_COALESCE", "1") != "0")
+        register_singleflight(self.flights)
         self.last_interaction = time.time()
+        self.draining = False  # 收到 SIGTERM 后置位：/api/ready 返回 503，让负载均衡先把流量切走
+        # 模型调用：并发上限 + 短队列（排不上直接 503）、超时、熔断、带抖动的重试
+        self.max_inflight_llm = int(os.getenv("ECO_MAX_INFLIGHT_LLM", "16"))
+        self.llm_queue = int(os.getenv("ECO_LLM_QUEUE", "32"))
+        self.llm_queue_timeout = float(os.getenv("ECO_LLM_QUEUE_TIMEOUT_MS", "2000")) / 1000
+        self.model_slots = ConcurrencyLimiter(self.max_inflight_llm, self.llm_queue, self.llm_queue_timeout)
+        self._async_slots = None
+        self.model_timeout = float(os.getenv("ECO_MODEL_TIMEOUT", "20"))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("ECO_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("ECO_BREAKER_RESET_SECONDS", "30"))
+        )
+        register_breaker(self.breaker)
+        self.retry = RetryPolicy(
+            retries=int(os.getenv("ECO_MODEL_RETRIES", "2")),
+            base_delay=float(os.getenv("ECO_RETRY_BASE_MS", "100")) / 1000
+        )
+        self.batch_workers = int(os.getenv("ECO_BATCH_WORKERS", "8"))
+        # 每个会话的对话记忆：最近几轮原文 + 更早内容的摘要（ECO_HISTORY_TOKENS=0 关闭）
+        self.memory = ConversationMemory(
+            summarise=self._summarise,
+            token_budget=int(os.getenv("ECO_HISTORY_TOKENS", "600")),
+            summary_tokens=int(os.getenv("ECO_SUMMARY_TOKENS", "200"))
+        )
         self.help_commands = {
             "zh": {
                 "森林知识": "获取熊大提供的生态知识",
@@ -35,72 +108,553 @@ class EcoAISystem:
     def _init_personality(self):
         """初始化熊大人格"""
         try:
-            return EcoPersonality()
+            return EcoPersonality(ledger=self.ledger)
         except Exception as e:
             raise RuntimeError(f"🐻❌ Personality initialization failed: {str(e)}")
 
-    def _init_gemini(self):
-        """初始化Gemini模型"""
+    @property
+    def model(self):
+        """The model backend, built on first use: importing and configuring the SDK is most of cold start"""
+        model = self._model
+        if model is None:
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        self._model = self._init_model()
+                        self.model_error = None
+                    except Exception as e:
+                        self.model_error = str(e)
+                        raise
+                model = self._model
+        return model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    def warm_up(self):
+        """Build the model in a background thread (ECO_MODEL_WARMUP=0 to skip); local commands work meanwhile"""
+        if self._model is not None or os.getenv("ECO_MODEL_WARMUP", "1") == "0":
+            return
+
+        def build():
+            try:
+                self.model
+            except Exception as e:
+                print(f"⚠️ Model warm-up failed, will retry on first use: {e}")
+
+        threading.Thread(target=build, name="eco-model-warmup", daemon=True).start()
+
+    def _init_model(self):
+        """初始化模型后端（ECO_MODEL_PROVIDER: gemini 或离线 stub）"""
         try:
-            env_path = Path(__file__).parent / 'API.env'
-            print(f"🌲 正在加载环境文件: {env_path}")
-
-            if not env_path.exists():
-                raise FileNotFoundError(f"❌ 环境文件不存在: {env_path}")
-            
-            load_dotenv(env_path)
-            print("🌲 环境变量加载成功")
-
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise ValueError("❌ API key not found")
-            genai.configure(api_key=api_key)
-            return genai.GenerativeModel('gemini-2.0-flash')
+            if not ENV_PATH.exists() and os.getenv("ECO_MODEL_PROVIDER", "gemini").lower() == "gemini" \
+                    and not os.getenv("GEMINI_API_KEY"):
+                raise FileNotFoundError(f"❌ 环境文件不存在: {ENV_PATH}")
+
+            provider = create_provider()
+            print(f"🌲 模型后端: {provider.name}")
+            return provider
         except Exception as e:
             raise RuntimeError(f"🤖❌ Model loading failed:{str(e)}")
 
-    # Modify the process_query method
-    def process_query(self, user_input):
+    def reload_personality(self, persona):
+        """Swap in a newly compiled personality.
+
+        One attribute assignment, so each request sees either the old or
+        the new version; requests already running keep the one they took.
+        """
+        persona.state = self.persona.state  # CLI 用户的进度跟着走
+        self.persona = persona
+
+    def _persona_for(self, state, base=None):
+        base = base or self.persona
+        return base if state is None else base.for_session(state)
+
+    def _prepare(self, user_input, persona):
+        """Run the local part of a query.
+
+        Returns (reply, None) when a local command answered it, or
+        (None, job) when the Gemini model is needed; job holds the prompt
+        and the response-cache key.
+        """
+        # Help command
+        if user_input.lower() == "help":
+            COMMANDS.inc("help")
+            return self._show_help(persona.current_lang), None
+
+        # Process input through personality system first
+        started = time.perf_counter()
+        processed = persona.process_input(user_input)
+        # 命中指令时处理函数就在 process_input 里执行，记为 command 阶段
+        stage = "command" if 'command' in processed or 'quiz' in processed else "input"
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+        if 'error' in processed:
+            return f"🐻💢 {processed['error']}", None
+        if 'quiz' in processed:
+            QUIZ_ANSWERS.inc(processed['quiz'])
+
+        # Achievement check
+        if user_input.lower() in self.IMPACT_COMMANDS:
+            COMMANDS.inc("my_impact")
+            lang = persona.current_lang
+            co2 = persona.carbon_offset
+            if lang == "zh":
+                return f"🌍 你已减少{co2}kg碳排放！({persona._get_equivalent(co2)})", None
+            else:
+                return f"🌍 You've reduced {co2}kg CO₂! ({persona._get_equivalent(co2)})", None
+
+        # Direct command results (matched once, inside the personality)
+        if 'command' in processed:
+            COMMANDS.inc(processed['handler'])
+            return processed['processed'], None
+
+        # Normal AI response with language matching
+        lang = getattr(persona, 'current_lang', 'en')
+        prompt = {
+            'zh': f"请用熊大的口吻用中文回答（用'俺'自称，带🌲🐻表情）: {processed['processed']}",
+            'en': f"Respond as Bear Guardian in English (use 'I' and forest emojis): {processed['processed']}"
+        }[lang]
+        prompt_key = processed.get('prompt_key')
+        context = self.memory.snapshot(persona.state, lang)
+        return None, {
+            'prompt': prompt,
+            'lang': lang,
+            'user_text': user_input,
+            'context': context,
+            # 有上下文的回答取决于之前聊了什么，不能跨会话缓存
+            'cache_key': ResponseCache.make_key(prompt_key, lang) if prompt_key and not context else None,
+            # 熔断时拿同一问题以前的回答顶上（不管上下文）
+            'fallback_key': ResponseCache.make_key(prompt_key, lang) if prompt_key else None,
+            'special': processed.get('special')
+        }
+
+    def process_query(self, user_input, state=None):
+        """Answer one message; `state` is the caller's SessionState (None = CLI user)"""
+        return self.answer(user_input, state)[0]
+
+    def answer(self, user_input, state=None):
+        """process_query that also returns the reply's meta (its carbon footprint)"""
+        persona = self._persona_for(state)
+        started = time.perf_counter()
+        kind = "local"
+        try:
+            reply, job = self._prepare(user_input, persona)
+            if job is None:
+                return self._local(persona, reply)
+
+            kind = "model"
+            try:
+                text = self._generate(job)
+            except CircuitOpen:
+                kind = "degraded"
+                return self._reply(self._degraded(persona, job))
+            return self._reply(self._finish(persona, job, text))
+
+        except Overloaded:
+            kind = "rejected"
+            raise
+        except Exception as e:
+            kind = "error"
+            return self._local(persona, self._error_text(e))
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, kind)
+
+    async def process_query_async(self, user_input, state=None):
+        """Async process_query: local commands answer at once, model calls share a bounded pool"""
+        return (await self.answer_async(user_input, state))[0]
+
+    async def answer_async(self, user_input, state=None):
+        persona = self._persona_for(state)
+        started = time.perf_counter()
+        kind = "local"
         try:
-            # Help command
-            if user_input.lower() == "help":
-                return self._show_help()
-
-            # Process input through personality system first
-            processed = self.persona.process_input(user_input)
-            if 'error' in processed:
-                return f"🐻💢 {processed['error']}"
-
-            # Achievement check
-            if user_input.lower() in ["my impact", "我的贡献"]:
-                lang = self.persona.current_lang
-                if lang == "zh":
-                    return f"🌍 你已减少{self.persona.carbon_offset}kg碳排放！({self.persona._get_equivalent(self.persona.carbon_offset)})"
-                else:
-                    return f"🌍 You've reduced {self.persona.carbon_offset}kg CO₂! ({self.persona._get_equivalent(self.persona.carbon_offset)})"
-
-            # Direct command results
-            if any(cmd in user_input for cmd in ["熊大讲故事", "Bear story", "巡逻森林", "Patrol forest", 
-                                               "熊大考考你", "Bear quiz", "熊大饿了", "Bear hungry",
-                                                "我的森林", "My forest"]):
-                return processed['processed']
-
-            # Normal AI response with language matching
-            lang = getattr(self.persona, 'current_lang', 'en')
-            prompt = {
-                'zh': f"请用熊大的口吻用中文回答（用'俺'自称，带🌲🐻表情）: {processed['processed']}",
-                'en': f"Respond as Bear Guardian in English (use 'I' and forest emojis): {processed['processed']}"
-            }[lang]
-            
-            response = self.model.generate_content(prompt)
-            return self.persona.format_response(response.text)['display']
+            # 本地步骤要读 SQLite（账本汇总、内容库抽样），放到线程池里，不占事件循环
+            reply, job = await asyncio.to_thread(self._prepare, user_input, persona)
+            if job is None:
+                return self._local(persona, reply)
 
+            kind = "model"
+            try:
+                text = await self._generate_async(job)
+            except CircuitOpen:
+                kind = "degraded"
+                return self._reply(await asyncio.to_thread(self._degraded, persona, job))
+            return self._reply(await asyncio.to_thread(self._finish, persona, job, text))
+
+        except Overloaded:
+            kind = "rejected"
+            raise
         except Exception as e:
-            return f"🐻❌ Error occurred: {str(e)}\nType 'help' for available commands"
+            kind = "error"
+            return self._local(persona, self._error_text(e))
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, kind)
+
+    @staticmethod
+    def _reply(formatted):
+        return formatted['display'], formatted['meta']
+
+    @staticmethod
+    def _local(persona, text):
+        """(text, meta) for a reply that skipped format_response"""
+        return text, {'carbon_offset': persona._calculate_carbon_footprint(text)}
+
+    def stream_query(self, user_input, state=None):
+        """Streaming process_query: yields (event, data) pairs for Server-Sent Events.
+
+        'delta' events carry display text as it arrives; the final 'done'
+        event carries the footer, achievement and carbon meta.
+        """
+        persona = self._persona_for(state)
+        try:
+            reply, job = self._prepare(user_input, persona)
+            if job is None:
+                yield 'delta', {'text': reply}
+                yield 'done', {'meta': self._local(persona, reply)[1]}
+                return
+
+            rewriter = persona.bear_language_stream()
+            parts = []
+            raw = []
+            try:
+                for chunk in self._generate_stream(job):
+                    raw.append(chunk)
+                    text = rewriter.feed(chunk)
+                    if text:
+                        parts.append(text)
+                        yield 'delta', {'text': text}
+            except CircuitOpen:
+                # 熔断在出第一个字之前就抛出，rewriter 里还是空的
+                parts.append(self._fallback_text(persona, job))
+                yield 'delta', {'text': parts[-1]}
+            else:
+                self.memory.record(persona.state, job['user_text'], ''.join(raw))
+            text = rewriter.flush()
+            if job['special']:
+                text += f"\n{job['special']}"
+            if text:
+                parts.append(text)
+                yield 'delta', {'text': text}
+
+            formatted = persona.format_response(''.join(parts))
+            yield 'done', {
+                'footer': formatted['footer'],
+                'achievement': formatted['achievement'],
+                'meta': formatted['meta']
+            }
+
+        except Exception as e:
+            yield 'error', {'error': self._error_text(e)}
+
+    def process_batch(self, items, sessions):
+        """Answer many messages at once; yields one result dict per item as it completes.
+
+        items is a list of (message, session_id); sessions is the SessionStore.
+        Local commands are answered inline, model-bound messages go through
+        a pool of ECO_BATCH_WORKERS threads, and identical prompts share one
+        model call.
+        """
+        started = time.perf_counter()
+        base = self.persona  # 整批用同一版本的人格配置
+        waiting = {}  # prompt key -> [(index, session_id, job), ...]
+        for index, (message, session_id) in enumerate(items):
+            try:
+                with sessions.session(session_id) as state:
+                    try:
+                        reply, job = self._prepare(message, self._persona_for(state, base))
+                    except Exception as e:
+                        reply, job = self._error_text(e), None
+            except SessionConflict as e:
+                reply, job = self._error_text(e), None  # 没存下，就不去问模型
+            if job is None:
+                yield self._batch_result(index, session_id, self._local(base, reply), started, model_ms=0)
+            else:
+                # 带对话上下文的消息各问各的，不合并
+                key = job['cache_key'] or (('context', index) if job['context'] else job['prompt'])
+                waiting.setdefault(key, []).append((index, session_id, job))
+
+        pool = ThreadPoolExecutor(max_workers=self.batch_workers)
+        try:
+            futures = {pool.submit(self._timed_generate, group[0][2]): group for group in waiting.values()}
+            for future in as_completed(futures):
+                group = futures[future]
+                for position, (index, session_id, job) in enumerate(group):
+                    try:
+                        with sessions.session(session_id) as state:
+                            # 同一会话的其他消息可能改了语言，按这条消息的语言收尾
+                            persona = self._persona_for(state, base)
+                            persona.current_lang = job['lang']
+                            try:
+                                text, model_ms = future.result()
+                                reply = self._reply(self._finish(persona, job, text))
+                            except CircuitOpen:
+                                reply, model_ms = self._reply(self._degraded(persona, job)), 0
+                            except Exception as e:
+                                reply, model_ms = self._local(persona, self._error_text(e)), 0
+                    except SessionConflict as e:
+                        reply, model_ms = self._local(base, self._error_text(e)), 0
+                    yield self._batch_result(index, session_id, reply, started, model_ms, coalesced=position > 0)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _timed_generate(self, job):
+        started = time.perf_counter()
+        text = self._generate(job)
+        return text, (time.perf_counter() - started) * 1000
 
-    def _show_help(self):
+    def _batch_result(self, index, session_id, reply, started, model_ms, coalesced=False):
+        text, meta = reply
+        return {
+            "index": index,
+            "session_id": session_id,
+            "text": text,
+            "meta": meta,
+            "coalesced": coalesced,
+            "timing_ms": {
+                "model": round(model_ms, 2),
+                "total": round((time.perf_counter() - started) * 1000, 2)
+            }
+        }
+
+    @staticmethod
+    def _error_text(e):
+        return f"🐻❌ Error occurred: {str(e)}\nType 'help' for available commands"
+
+    def _finish(self, persona, job, text):
+        """Remember the turn, Bear-style the model text, add any knowledge card, then the footer"""
+        self.memory.record(persona.state, job['user_text'], text)
+        with STAGE_SECONDS.time("format"):
+            text = persona._apply_bear_language(text)
+            if job['special']:
+                text += f"\n{job['special']}"
+            return persona.format_response(text)
+
+    def _degraded(self, persona, job):
+        """Answer without the model while its circuit is open"""
+        with STAGE_SECONDS.time("format"):
+            text = self._fallback_text(persona, job)
+            if job['special']:
+                text += f"\n{job['special']}"
+            return persona.format_response(text)
+
+    def _fallback_text(self, persona, job):
+        """An earlier cached answer to the same question, else the config's happy_mode text"""
+        ADMISSION.inc("degraded")
+        text = self.cache.get(job['fallback_key']) if job['fallback_key'] else None
+        if text is None:
+            return persona.settings.texts[persona.current_lang].happy_response
+        return persona._apply_bear_language(text)
+
+    def _generate(self, job):
+        """Model text for a job: from the response cache, else one model call per distinct prompt in flight"""
+        text = self._cached(job)
+        if text is None:
+            # 提示词里带随机表情和结尾，按去掉装饰后的问题（即缓存键）合并
+            if job['cache_key']:
+                text = self.flights.do(job['cache_key'], self._ask, job)
+            else:
+                text = self._ask(job)
+        return text
+
+    async def _generate_async(self, job):
+        text = self._cached(job)
+        if text is None:
+            if job['cache_key']:
+                text = await self.flights.do_async(job['cache_key'], self._ask_async, job)
+            else:
+                text = await self._ask_async(job)
+        return text
+
+    def _ask(self, job):
+        if job['context']:
+            text = self._call_model(self.model.generate_chat, job['prompt'], job['context'])
+        else:
+            text = self._call_model(self.model.generate, job['prompt'])
+        self._store(job, text)  # 先写缓存再结束这次调用，之后来的请求直接命中缓存
+        return text
+
+    async def _ask_async(self, job):
+        if job['context']:
+            text = await self._call_model_async(self.model.generate_chat_async, job['prompt'], job['context'])
+        else:
+            text = await self._call_model_async(self.model.generate_async, job['prompt'])
+        self._store(job, text)
+        return text
+
+    def _call_model(self, call, *args):
+        """One model answer through the circuit breaker, the concurrency cap and retries.
+
+        Raises CircuitOpen (answer locally instead), Overloaded (no slot
+        in time: reject the request) or the model's last error.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpen()
+            try:
+                with self.model_slots.slot(), self._model_call():
+                    text = call(*args)
+            except Overloaded:
+                raise
+            except Exception as e:
+                self._record_model_error(e)
+                if not self.retry.should_retry(e, attempt):
+                    raise
+            else:
+                self.breaker.record_success()
+                return text
+            time.sleep(self.retry.backoff(attempt))
+            attempt += 1
+
+    async def _call_model_async(self, call, *args):
+        """_call_model for coroutines; the timeout is enforced here as well as in the provider"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpen()
+            try:
+                async with self._llm_slots().slot():
+                    with self._model_call():
+                        try:
+                            text = await asyncio.wait_for(call(*args), self.model_timeout)
+                        except asyncio.TimeoutError:
+                            raise ModelTimeout(f"🤖❌ Model did not answer within {self.model_timeout}s") from None
+            except Overloaded:
+                raise
+            except Exception as e:
+                self._record_model_error(e)
+                if not self.retry.should_retry(e, attempt):
+                    raise
+            else:
+                self.breaker.record_success()
+                return text
+            await asyncio.sleep(self.retry.backoff(attempt))
+            attempt += 1
+
+    def _record_model_error(self, error):
+        """Only transient errors count against the circuit breaker"""
+        if is_transient(error):
+            self.breaker.record_failure()
+        else:
+            # 被拦截、内容过滤之类：模型是通的，只是这个问题不行，不能让几个坏问题熔断整个 worker
+            self.breaker.record_success()
+
+    def _generate_stream(self, job):
+        """Like _generate, but yields the text in chunks as the model sends them"""
+        text = self._cached(job)
+        if text is not None:
+            yield text
+            return
+        parts = []
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpen()
+            try:
+                with self.model_slots.slot(), self._model_call():
+                    if job['context']:
+                        chunks = self.model.stream_chat(job['prompt'], job['context'])
+                    else:
+                        chunks = self.model.stream(job['prompt'])
+                    for chunk in chunks:
+                        parts.append(chunk)
+                        yield chunk
+            except Overloaded:
+                raise
+            except Exception as e:
+                self._record_model_error(e)
+                # 已经发出去的字收不回来，只有一个字都没出时才重试
+                if parts or not self.retry.should_retry(e, attempt):
+                    raise
+            else:
+                self.breaker.record_success()
+                break
+            time.sleep(self.retry.backoff(attempt))
+            attempt += 1
+        self._store(job, ''.join(parts))
+
+    def _summarise(self, prompt):
+        """Model call used by the conversation memory to fold old turns into a summary"""
+        return self._call_model(self.model.generate, prompt)
+
+    @contextmanager
+    def _model_call(self):
+        """Count and time one model call (the 'model' stage), and any error it raises"""
+        provider = getattr(self.model, 'name', 'custom')
+        MODEL_CALLS.inc(provider)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            MODEL_ERRORS.inc(provider, type(e).__name__)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, "model")
+
+    def _cached(self, job):
+        return self.cache.get(job['cache_key']) if job['cache_key'] else None
+
+    def _store(self, job, text):
+        if job['cache_key']:
+            self.cache.put(job['cache_key'], text)
+
+    def _llm_slots(self):
+        """Concurrency cap for async model calls (one per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._async_slots is None or self._async_slots[0] is not loop:
+            self._async_slots = (loop, AsyncConcurrencyLimiter(
+                self.max_inflight_llm, self.llm_queue, self.llm_queue_timeout))
+        return self._async_slots[1]
+
+    def readiness(self):
+        """Should this worker get traffic: not draining, and the model backend could be built"""
+        circuit = self.breaker.state
+        return {
+            # 模型还没创建不算未就绪：本地命令照常可用，模型在第一次用到（或预热）时创建
+            # 熔断时也照样就绪：本地命令和兜底回答都还能用，熔断状态只是报告出来
+            "ready": not self.draining and self.model_error is None,
+            "draining": self.draining,
+            "model": {
+                "provider": getattr(self._model, 'name', 'custom') if self._model is not None else None,
+                "loaded": self._model is not None,
+                "error": self.model_error
+            },
+            "circuit": circuit,
+            "config_version": self.config_watcher.version
+        }
+
+    def after_fork(self):
+        """Re-create what a forked worker cannot inherit from a preloading parent.
+
+        Threads (config watcher, ledger writer, summariser) are not copied
+        by fork, locks may have been held by one of them, and SQLite
+        connections must not be shared between processes.
+        """
+        self._model_lock = threading.Lock()
+        self.config_watcher.after_fork()
+        if self.ledger is not None:
+            self.ledger.after_fork()
+        self.memory.after_fork()
+        self.persona.content.after_fork()
+        self.cache.after_fork()
+        self.flights.after_fork()
+        self.model_slots = ConcurrencyLimiter(self.max_inflight_llm, self.llm_queue, self.llm_queue_timeout)
+        self._async_slots = None
+
+    def shutdown(self):
+        """Stop background work and flush the impact ledger (graceful exit)"""
+        self.config_watcher.stop()
+        self.memory.close()
+        if self.ledger is not None:
+            self.ledger.close()
+
+    def admission_stats(self):
+        slots = self._async_slots[1] if self._async_slots else self.model_slots
+        return {"circuit": self.breaker.stats(), "model_slots": slots.stats(), "coalescing": self.flights.stats()}
+
+    def _show_help(self, lang='en'):
         """显示帮助信息（自动匹配语言）"""
-        lang = getattr(self.persona, 'current_lang', 'en')
         help_text = {
             "zh": "🐻 我可以帮你：\n",
             "en": "🐻 I can help you with:\n"
@@ -116,6 +670,30 @@ class EcoAISystem:
         
         return help_text
 
+def chat_loop(ai, messages, on_reply, state=None):
+    """The conversation loop of the command line: answer each message until 'exit'.
+
+    on_reply(message, response, seconds) gets every answer. Returns True
+    if the user typed 'exit'. main() feeds it from input(); the replay
+    tool (benchmarks/replay.py) from a recorded transcript.
+    """
+    for user_input in messages:
+        user_input = user_input.strip()
+        if not user_input:
+            continue
+        if user_input.lower() == 'exit':
+            return True
+        started = time.perf_counter()
+        response = ai.process_query(user_input, state)
+        on_reply(user_input, response, time.perf_counter() - started)
+    return False
+
+
+def _typed_lines():
+    while True:
+        yield input("\nYou: ")
+
+
 def main():
     print("""
     ==========================================
@@ -127,25 +705,14 @@ def main():
 
     try:
         ai = EcoAISystem()
+        ai.warm_up()
         print("🐻 I'm Bear Guardian, protector of the forest! How can I help you today?")
 
-        while True:
-            try:
-                user_input = input("\nYou: ").strip()
-                
-                if not user_input:
-                    continue
-                    
-                if user_input.lower() == 'exit':
-                    print("🐻 Remember to visit the forest often! Goodbye~")
-                    break
-                
-                response = ai.process_query(user_input)
-                print("\nBear:", response)
-                
-            except KeyboardInterrupt:
-                print("\n🐻💤 Detected you're leaving... remember to turn off lights to save energy!")
-                break
+        try:
+            if chat_loop(ai, _typed_lines(), lambda _, response, __: print("\nBear:", response)):
+                print("🐻 Remember to visit the forest often! Goodbye~")
+        except KeyboardInterrupt:
+            print("\n🐻💤 Detected you're leaving... remember to turn off lights to save energy!")
                 
     except Exception as e:
         print(f"💥 System startup failed: {str(e)}")
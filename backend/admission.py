@@ -0,0 +1,260 @@
+"""Admission control in front of the model: who gets in, how many at once, and what to do when it is down.
+
+- RateLimiter: token bucket per client (429 when empty)
+- ConcurrencyLimiter / AsyncConcurrencyLimiter: cap on in-flight model
+  calls with a short, time-limited queue (503 when full)
+- CircuitBreaker: after repeated failures, stop calling the model for a
+  while and let the caller serve a degraded local answer
+- RetryPolicy: exponential backoff with full jitter for transient errors
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import REGISTRY
+from model_providers import ModelTimeout, ModelUnavailable
+
+ADMISSION = REGISTRY.counter(
+    "eco_admission_total", "Requests turned away or answered locally, by reason", labels=("reason",))
+
+# google.api_core 的可重试错误按类名判断，不必导入 SDK
+TRANSIENT_ERRORS = frozenset({
+    "DeadlineExceeded", "ServiceUnavailable", "InternalServerError", "TooManyRequests",
+    "ResourceExhausted", "GatewayTimeout", "BadGateway",
+})
+
+
+class RateLimited(Exception):
+    """The client has used up its request budget (HTTP 429)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many requests, try again in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """Every model slot is busy and the queue is full or too slow (HTTP 503)"""
+
+    def __init__(self, retry_after=1.0):
+        super().__init__("🐻💦 Bear is busy with other friends, please try again in a moment")
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    """The model is failing; answer locally instead of calling it"""
+
+
+def is_transient(error):
+    """Worth retrying: timeouts, dropped connections, overloaded or flaky backends"""
+    return (isinstance(error, (ModelTimeout, ModelUnavailable, TimeoutError, asyncio.TimeoutError, ConnectionError))
+            or type(error).__name__ in TRANSIENT_ERRORS)
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per second, bursts up to `burst`.
+
+    Only the `max_clients` most recently seen clients are kept; a client
+    that falls out starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client, cost=1):
+        """Take `cost` tokens; raises RateLimited (with the wait) if there are not enough.
+
+        A cost above `burst` is admitted on a full bucket and leaves it in
+        debt, so the client's next requests wait until all of it is repaid.
+        """
+        if not self.enabled:
+            return
+        need = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                bucket = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            admitted = bucket[0] >= need
+            if admitted:
+                bucket[0] -= cost
+            self._buckets[client] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if not admitted:
+            ADMISSION.inc("rate_limited")
+            raise RateLimited((need - bucket[0]) / self.rate)
+
+
+class ConcurrencyLimiter:
+    """At most `limit` model calls at once; up to `queue_size` more wait `queue_timeout` seconds"""
+
+    def __init__(self, limit, queue_size=32, queue_timeout=2.0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        ADMISSION.inc("overloaded")
+        return Overloaded(retry_after=max(self.queue_timeout, 1.0))
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                full = self.waiting >= self.queue_size
+                if not full:
+                    self.waiting += 1
+            if full:
+                raise self._reject()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                raise self._reject()
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting,
+                "queue_size": self.queue_size, "rejected": self.rejected}
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """ConcurrencyLimiter for one event loop: waiting requests never block it"""
+
+    def __init__(self, limit, queue_size=32, queue_timeout=2.0):
+        super().__init__(limit, queue_size, queue_timeout)
+        self._slots = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        # 单线程事件循环里计数不需要加锁
+        if self._slots.locked():
+            if self.waiting >= self.queue_size:
+                raise self._reject()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject() from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+
+class CircuitBreaker:
+    """closed -> (failure_threshold failures in a row) -> open -> (reset_timeout) -> half-open.
+
+    While open, allow() is False. After reset_timeout one probe call is
+    let through: success closes the circuit, failure opens it again.
+    """
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # 放一个探测请求过去，下一个要再等 reset_timeout
+            self.state = "half_open"
+            self._opened_at = now
+            return True
+
+    def record_success(self):
+        if self.state == "closed" and not self.failures:
+            return
+        with self._lock:
+            if self.state != "closed":
+                print("🌲 Model recovered, circuit closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opens += 1
+                self._opened_at = time.monotonic()
+                print(f"⚠️ Model failing ({self.failures} errors), circuit open for {self.reset_timeout}s")
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "opens": self.opens}
+
+
+class RetryPolicy:
+    """Up to `retries` extra attempts; wait a random time in [0, base * 2**attempt], capped at max_delay"""
+
+    def __init__(self, retries=2, base_delay=0.1, max_delay=2.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error, attempt):
+        return attempt < self.retries and is_transient(error)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def create_rate_limiter():
+    """Per-client limiter from ECO_RATE_LIMIT (requests per second, 0 = off) and ECO_RATE_BURST"""
+    return RateLimiter(float(os.getenv("ECO_RATE_LIMIT", "5")), int(os.getenv("ECO_RATE_BURST", "20")))
+
+
+def register_breaker(breaker, registry=REGISTRY):
+    """Export the circuit state (0 closed, 1 half-open, 2 open)"""
+    registry.unregister("eco_model_circuit_state")
+    registry.gauge(
+        "eco_model_circuit_state", "Model circuit breaker: 0 closed, 1 half-open, 2 open",
+        lambda: {(): CircuitBreaker.STATES[breaker.state]})
@@ -1,31 +1,171 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from admission import Overloaded, RateLimited, create_rate_limiter
 from Gemini import EcoAISystem
+from session_store import SessionConflict, create_session_store
+from metrics import REGISTRY, SamplingProfiler
+import json
+import math
 import os
-from dotenv import load_dotenv
-
-# 加载环境变量
-load_dotenv()
 
 app = Flask(__name__)
-CORS(app)  # 解决跨域问题
+CORS(app, expose_headers=["X-Session-Id", "Retry-After"])  # 解决跨域问题
 ai_system = EcoAISystem()
+session_store = create_session_store()
+rate_limiter = create_rate_limiter()
+
+SESSION_COOKIE = "eco_session"
+SESSION_HEADER = "X-Session-Id"
+BATCH_MAX_ITEMS = int(os.getenv("ECO_BATCH_MAX_ITEMS", "200"))
+# 允许单个请求带 X-Eco-Profile: 1 打开采样分析（默认关闭）
+PROFILING_ENABLED = os.getenv("ECO_PROFILING", "0") == "1"
+LEADERBOARD_MAX = 100
+
+
+def _session_id():
+    """会话ID：优先请求头，其次 Cookie，都没有就新建一个"""
+    sid = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if session_store.valid_id(sid):
+        return sid
+    return session_store.new_id()
+
+
+def _rejected(error, status):
+    """429 / 503 with a Retry-After hint"""
+    resp = jsonify({"error": str(error)})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return resp
+
+
+def _with_session(resp, session_id):
+    resp.headers[SESSION_HEADER] = session_id
+    resp.set_cookie(SESSION_COOKIE, session_id, max_age=session_store.ttl, samesite="Lax")
+    return resp
+
 
 @app.route('/api/chat', methods=['POST'])
 def chat_handler():
     try:
+        rate_limiter.check(request.remote_addr)
         user_input = request.json.get('message', '')
-        response = ai_system.process_query(user_input)
-        
-        return jsonify({
+        session_id = _session_id()
+        profiler = None
+        with session_store.session(session_id) as state:
+            if PROFILING_ENABLED and request.headers.get("X-Eco-Profile") == "1":
+                with SamplingProfiler() as profiler:
+                    response, meta = ai_system.answer(user_input, state)
+            else:
+                response, meta = ai_system.answer(user_input, state)
+
+        body = {
             "text": response,
-            "meta": {
-                # "trees": ai_system.persona.trees,
-                "carbon_offset": ai_system.persona._calculate_carbon_footprint(response)
-            }
-        })
+            "session_id": session_id,
+            "meta": meta  # {"carbon_offset": ...}，在 format_response 里已算好
+        }
+        if profiler is not None:
+            body["profile"] = profiler.report()
+        return _with_session(jsonify(body), session_id)
+    except RateLimited as e:
+        return _rejected(e, 429)
+    except Overloaded as e:
+        return _rejected(e, 503)
+    except SessionConflict as e:
+        return _rejected(e, 409)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_handler():
+    """Same as /api/chat, but streamed as Server-Sent Events"""
+    try:
+        rate_limiter.check(request.remote_addr)
+    except RateLimited as e:
+        return _rejected(e, 429)
+    user_input = (request.get_json(silent=True) or {}).get('message', '')
+    session_id = _session_id()
+
+    def events():
+        # 先发一个事件，让浏览器立刻收到响应头
+        yield _sse('start', {'session_id': session_id})
+        try:
+            with session_store.session(session_id) as state:
+                for event, data in ai_system.stream_query(user_input, state):
+                    yield _sse(event, data)
+        except SessionConflict as e:
+            # 回答已经发出去了，只是没存下；告诉前端这一轮不算
+            yield _sse('error', {'error': str(e)})
+
+    resp = Response(stream_with_context(events()), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return _with_session(resp, session_id)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch_handler():
+    """Many messages in one request (e.g. a whole class); answers stream back as NDJSON"""
+    messages = (request.get_json(silent=True) or {}).get('messages')
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "'messages' must be a non-empty list"}), 400
+    if len(messages) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} messages per batch"}), 400
+    try:
+        rate_limiter.check(request.remote_addr, cost=len(messages))
+    except RateLimited as e:
+        return _rejected(e, 429)
+
+    # 每条可以带自己的 session_id（每个学生一个），否则用本次请求的会话
+    default_session = _session_id()
+    items = []
+    for item in messages:
+        if isinstance(item, dict):
+            sid = item.get('session_id')
+            items.append((str(item.get('message', '')), sid if session_store.valid_id(sid) else default_session))
+        else:
+            items.append((str(item), default_session))
+
+    def lines():
+        for result in ai_system.process_batch(items, session_store):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    resp = Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return _with_session(resp, default_session)
+
+
+@app.route('/api/stats', methods=['GET'])
+def stats_handler():
+    return jsonify({"cache": ai_system.cache.stats(), "config": ai_system.config_watcher.stats(),
+                    "admission": ai_system.admission_stats(), "sessions": session_store.stats()})
+
+
+@app.route('/api/ready', methods=['GET'])
+def ready_handler():
+    """Readiness probe: 503 while draining or while the model backend is down"""
+    status = ai_system.readiness()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route('/api/leaderboard', methods=['GET'])
+def leaderboard_handler():
+    """Top players by carbon offset; names are derived from the session id, never the id itself"""
+    if ai_system.ledger is None:
+        return jsonify({"error": "Impact ledger is disabled"}), 404
+    limit = max(1, min(request.args.get('limit', 10, type=int), LEADERBOARD_MAX))
+    return jsonify({"leaderboard": ai_system.ledger.leaderboard(limit)})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_handler():
+    """Prometheus text format: stage timings, commands, cache, model errors, quiz outcomes"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    ai_system.warm_up()
+    app.run(port=5000, debug=True)
@@ -0,0 +1,149 @@
+"""Asyncio serving mode for the Bear API.
+
+Run with any ASGI server, e.g.:  uvicorn asgi_server:app --port 5000
+Model calls are awaited (never block the event loop) and capped by
+ECO_MAX_INFLIGHT_LLM; local commands never wait for a model slot.
+"""
+import asyncio
+import json
+import math
+import weakref
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from admission import Overloaded, RateLimited, create_rate_limiter
+from Gemini import EcoAISystem
+from metrics import REGISTRY
+from session_store import SessionConflict, create_session_store
+
+ai_system = EcoAISystem()
+session_store = create_session_store()
+rate_limiter = create_rate_limiter()
+
+SESSION_COOKIE = "eco_session"
+SESSION_HEADER = "x-session-id"
+MAX_BODY_BYTES = 64 * 1024
+LEADERBOARD_MAX = 100
+
+# 同一会话的请求按顺序处理；锁随会话空闲自动回收
+_session_locks = weakref.WeakValueDictionary()
+
+_CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type, X-Session-Id"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-expose-headers", b"X-Session-Id, Retry-After"),
+]
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+def _session_id(headers):
+    sid = headers.get(SESSION_HEADER)
+    if not sid and "cookie" in headers:
+        morsel = SimpleCookie(headers["cookie"]).get(SESSION_COOKIE)
+        sid = morsel.value if morsel else None
+    return sid if session_store.valid_id(sid) else session_store.new_id()
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [(b"content-type", b"application/json; charset=utf-8"),
+               (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status,
+                "headers": headers + _CORS_HEADERS + list(extra_headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def chat_handler(scope, receive, send):
+    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+    try:
+        rate_limiter.check((scope.get("client") or ("unknown",))[0])
+        user_input = json.loads(await _read_body(receive) or b"{}").get('message', '')
+        session_id = _session_id(headers)
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = _session_locks[session_id] = asyncio.Lock()
+        async with lock:
+            state = session_store.get(session_id)
+            try:
+                response, meta = await ai_system.answer_async(user_input, state)
+            finally:
+                session_store.put(session_id, state)
+
+        cookie = f"{SESSION_COOKIE}={session_id}; Max-Age={session_store.ttl}; Path=/; SameSite=Lax"
+        await _send_json(send, 200, {
+            "text": response,
+            "session_id": session_id,
+            "meta": meta
+        }, [(b"x-session-id", session_id.encode()), (b"set-cookie", cookie.encode())])
+    except (RateLimited, Overloaded, SessionConflict) as e:
+        status = 429 if isinstance(e, RateLimited) else 409 if isinstance(e, SessionConflict) else 503
+        await _send_json(send, status, {"error": str(e)},
+                         [(b"retry-after", str(max(1, math.ceil(e.retry_after))).encode())])
+    except Exception as e:
+        await _send_json(send, 500, {"error": str(e)})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            ai_system.warm_up()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            ai_system.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def leaderboard_handler(scope, send):
+    if ai_system.ledger is None:
+        return await _send_json(send, 404, {"error": "Impact ledger is disabled"})
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    try:
+        limit = int(query.get("limit", ["10"])[0])
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, LEADERBOARD_MAX))
+    await _send_json(send, 200, {"leaderboard": ai_system.ledger.leaderboard(limit)})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": _CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+    elif path == "/api/chat" and method == "POST":
+        await chat_handler(scope, receive, send)
+    elif path == "/api/stats" and method == "GET":
+        await _send_json(send, 200, {"cache": ai_system.cache.stats(), "config": ai_system.config_watcher.stats(),
+                                     "admission": ai_system.admission_stats(),
+                                     "sessions": session_store.stats()})
+    elif path == "/api/ready" and method == "GET":
+        status = ai_system.readiness()
+        await _send_json(send, 200 if status["ready"] else 503, status)
+    elif path == "/api/leaderboard" and method == "GET":
+        await leaderboard_handler(scope, send)
+    elif path == "/metrics" and method == "GET":
+        body = REGISTRY.render().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
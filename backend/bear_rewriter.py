@@ -0,0 +1,163 @@
+import re
+
+# 英文词只在整词处替换（"I" 不改 "In"，"we" 不改 "were"）
+_WORD_START = r"(?<![A-Za-z])"
+_WORD_END = r"(?![A-Za-z])"
+
+# 规则少时逐条替换（C 层的 str.replace）比一遍正则扫描快；规则多了正则才划算
+CHAIN_MAX_RULES = 40
+
+
+def _is_word(key):
+    return key[0].isascii() and key[0].isalpha() and key[-1].isascii() and key[-1].isalpha()
+
+
+def _trie_pattern(keys):
+    """Regex for a set of literals, shaped as a prefix trie.
+
+    Greedy optional tails make the longest key win, and the engine never
+    re-tries a shared prefix, so cost barely grows with the number of keys.
+    """
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        alts = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+def _is_letter(char):
+    return char.isascii() and char.isalpha()
+
+
+def _overlaps(a, b):
+    """True if a can end inside b, i.e. a proper suffix of a is a proper prefix of b.
+
+    Two whole words cannot both match across such an overlap when a
+    letter sits right after a or right before b.
+    """
+    words = _is_word(a) and _is_word(b)
+    return any(a.endswith(b[:n]) and not (words and (_is_letter(a[-n - 1]) or _is_letter(b[n])))
+               for n in range(1, min(len(a), len(b))))
+
+
+def _lands_in(key, value):
+    """True if key could match text that includes part of value.
+
+    Tries every alignment of key against value; a word key only counts
+    where the letters next to it inside value leave a word boundary.
+    """
+    for offset in range(1 - len(key), len(value)):
+        start, end = max(offset, 0), min(offset + len(key), len(value))
+        if key[start - offset:end - offset] != value[start:end]:
+            continue
+        if _is_word(key) and ((0 < offset <= len(value) and _is_letter(value[offset - 1]))
+                              or (0 <= offset + len(key) < len(value)
+                                  and _is_letter(value[offset + len(key)]))):
+            continue
+        return True
+    return False
+
+
+def _chain_order(mapping):
+    """Keys in an order where replacing one rule at a time equals the single pass.
+
+    Longest key first; None if rules could interact: two keys overlapping
+    end to start, a whole-word key inside another kind of key (the regex
+    tries words first), a later key able to match inside (or across the
+    edge of) an earlier replacement, or a replacement changing whether
+    its neighbours sit on a word boundary.
+    """
+    keys = sorted(mapping, key=len, reverse=True)
+    if any(_is_word(k) for k in keys):
+        for key, value in mapping.items():
+            if not value or _is_letter(key[0]) != _is_letter(value[0]) \
+                    or _is_letter(key[-1]) != _is_letter(value[-1]):
+                return None
+    for a in keys:
+        for b in keys:
+            if a != b and (_overlaps(a, b) or (_is_word(a) != _is_word(b) and a in b)):
+                return None
+    for i, key in enumerate(keys):
+        if any(_lands_in(key, mapping[earlier]) for earlier in keys[:i]):
+            return None
+    return keys
+
+
+class BearRewriter:
+    """All of Bear's word replacements compiled into one regex.
+
+    One left-to-right pass over the text; where several phrases start at
+    the same place the longest wins, and replaced text is never rescanned.
+    Small tables whose rules cannot interact are applied rule by rule
+    instead, which gives the same result with less per-call overhead.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = {k: v for k, v in mapping.items() if k}
+        self.max_len = max((len(k) for k in self.mapping), default=0)
+        words = [k for k in self.mapping if _is_word(k)]
+        others = [k for k in self.mapping if not _is_word(k)]
+        parts = []
+        if words:
+            parts.append(_WORD_START + _trie_pattern(words) + _WORD_END)
+        if others:
+            parts.append(_trie_pattern(others))
+        self.pattern = re.compile("|".join(parts)) if parts else None
+
+        self.chain = None
+        order = _chain_order(self.mapping) if len(self.mapping) <= CHAIN_MAX_RULES else None
+        if order is not None:
+            # 英文词用以字面量开头的正则（引擎能先快速定位），边界在匹配后再查
+            self.chain = [(re.compile(re.escape(k) + "(?<![A-Za-z]" + re.escape(k) + ")" + _WORD_END),
+                           self.mapping[k].replace("\\", "\\\\")) if _is_word(k)
+                          else (k, self.mapping[k]) for k in order]
+
+    def rewrite(self, text):
+        if self.chain is not None:
+            for rule, replacement in self.chain:
+                if isinstance(rule, str):
+                    text = text.replace(rule, replacement)
+                else:
+                    text = rule.sub(replacement, text)
+            return text
+        if self.pattern is None:
+            return text
+        mapping = self.mapping
+        return self.pattern.sub(lambda m: mapping[m.group()], text)
+
+    def rewrite_ready(self, buffer, pos=0, final=False):
+        """Rewrite the part of buffer[pos:] that later text can no longer change.
+
+        Returns (rewritten text, cut); buffer[cut:] is still undecided
+        unless final is True. Characters before pos are only used as
+        look-behind context.
+        """
+        if final:
+            safe = len(buffer)
+        else:
+            # 一个词是否命中最多取决于其后 max_len 个字符
+            safe = max(len(buffer) - self.max_len, pos)
+        if self.pattern is None:
+            return buffer[pos:safe], safe
+
+        out = []
+        last = pos
+        for m in self.pattern.finditer(buffer, pos):
+            if m.start() >= safe:
+                break
+            out.append(buffer[last:m.start()])
+            out.append(self.mapping[m.group()])
+            last = m.end()
+        cut = max(last, safe)
+        out.append(buffer[last:cut])
+        return "".join(out), cut
@@ -0,0 +1,72 @@
+"""Microbenchmark: Bear-style rewriting of long model outputs.
+
+Compares the old chained str.replace loop with the BearRewriter used by
+EcoPersonality._apply_bear_language; "path" is what the rewriter chose
+for the table (rule-by-rule "chain" or the single-pass "regex"):
+
+    python benchmarks/bench_bear_language.py
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bear_rewriter import BearRewriter
+from eco_personality import EcoPersonality
+
+SAMPLES = {
+    "en": ("I know we should protect the environment, and people can help the eco system. "
+           "In the forest we were always happy; Bear knows trees matter to everyone. "),
+    "zh": "你们应该知道环保很重要，生态系统需要你们保护。可以从节约用纸开始，让森林更绿。",
+}
+
+
+def chained_replace(text, replacements):
+    for standard, bear_version in replacements.items():
+        text = text.replace(standard, bear_version)
+    return text
+
+
+def path(rewriter):
+    return "chain" if rewriter.chain is not None else "regex"
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    persona = EcoPersonality()
+    print("Built-in rules, growing output length")
+    print(f"{'lang':<6}{'chars':>8}{'chained µs':>14}{'compiled µs':>14}{'speed-up':>10}{'path':>7}")
+    for lang, sample in SAMPLES.items():
+        persona.current_lang = lang
+        rewriter = persona.rewriters[lang]
+        for repeat in (4, 40, 400):
+            text = sample * repeat
+            number = max(10, 20000 // repeat)
+            old_us = per_call_us(lambda: chained_replace(text, rewriter.mapping), number)
+            new_us = per_call_us(lambda: rewriter.rewrite(text), number)
+            print(f"{lang:<6}{len(text):>8}{old_us:>14.1f}{new_us:>14.1f}{old_us / new_us:>9.2f}x"
+                  f"{path(rewriter):>7}")
+
+    # 配置里的 熊大式表达 映射表变大时的表现
+    print("\nGrowing rule table (en, 6k chars)")
+    print(f"{'rules':<8}{'chained µs':>12}{'compiled µs':>14}{'speed-up':>10}{'path':>7}")
+    text = SAMPLES["en"] * 40
+    rng = random.Random(7)
+    for extra in (0, 10, 30, 50, 500, 2000):
+        mapping = dict(EcoPersonality.BEAR_WORDS["en"])
+        while len(mapping) < len(EcoPersonality.BEAR_WORDS["en"]) + extra:
+            word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+            mapping[word] = word.upper()
+        rewriter = BearRewriter(mapping)
+        old_us = per_call_us(lambda: chained_replace(text, mapping), 20)
+        new_us = per_call_us(lambda: rewriter.rewrite(text), 20)
+        print(f"{len(mapping):<8}{old_us:>12.1f}{new_us:>14.1f}{old_us / new_us:>9.2f}x{path(rewriter):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Microbenchmark: the work done after the model answers, per request.
+
+"before" reproduces the old path: named str.format for the footer and
+achievement, f-string concatenation, then chat_handler measuring the
+carbon footprint of the whole reply a second time. "after" is
+EcoPersonality.format_response with precompiled templates, one join and
+the footprint returned in its meta.
+
+    python benchmarks/bench_format_response.py [--replies 2000]
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import corpus
+from bench_utils import measure_allocations, time_calls
+from eco_personality import EcoPersonality
+from session_random import SessionRandom
+from session_store import SessionState
+
+
+def old_format_response(persona, ai_text):
+    texts = persona.settings.texts[persona.current_lang]
+    achievement = None
+    if persona.interaction_count % persona.settings.achievement_interval == 0:
+        persona._credit('achievement', 0.5)
+        achievement = random.choice(texts.achievement_messages)
+    carbon_offset = persona.carbon_offset
+    if achievement:
+        achievement = achievement.format(count=carbon_offset)
+    tip = persona._sample_content('tip')
+    footer = texts.footer_template.format(
+        random_tip=tip['text'] if tip else random.choice(texts.tips),
+        carbon_offset=carbon_offset,
+        equivalent=persona._get_equivalent(carbon_offset)
+    )
+    response = f"{ai_text}\n\n{footer}"
+    if achievement:
+        response += f"\n{achievement}"
+    persona._record('footprint', persona._calculate_carbon_footprint(response))
+    formatted = {'display': response, 'footer': footer, 'achievement': achievement}
+    # chat_handler 再量一遍
+    return formatted, {"carbon_offset": persona._calculate_carbon_footprint(formatted['display'])}
+
+
+def new_format_response(persona, ai_text):
+    formatted = persona.format_response(ai_text)
+    return formatted, formatted['meta']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    replies = corpus.model_outputs(args.replies)
+    print(f"{'variant':<8}{'lang':>5}{'mean µs':>10}{'p99 µs':>10}{'ops/s':>12}{'peak B':>10}{'kept B':>9}")
+    for lang in ("zh", "en"):
+        for name, fn in (("before", old_format_response), ("after", new_format_response)):
+            random.seed(7)
+            persona = EcoPersonality().for_session(SessionState(rng=SessionRandom(7)))
+            persona.current_lang = lang
+
+            def call(text):
+                persona.interaction_count += 1  # 每 5 次带一条成就
+                fn(persona, text)
+
+            timing = time_calls(call, replies, args.rounds)
+            allocs = measure_allocations(call, replies)
+            print(f"{name:<8}{lang:>5}{timing['mean_us']:>10.2f}{timing['p99_us']:>10.2f}"
+                  f"{timing['ops_per_s']:>12.0f}{allocs['peak_bytes_per_call']:>10.0f}"
+                  f"{allocs['retained_bytes_per_call']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Microbenchmark: language detection on short messages and long pastes.
+
+Compares the old per-character scan ("Chinese if more than half the
+characters are CJK") with language_detector.detect_language, and counts
+how often each flips the language over a session of mixed messages:
+
+    python benchmarks/bench_language_detect.py
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import corpus
+from language_detector import detect_language
+
+# 一段中英混杂的对话：说中文的孩子会夹几个英文命令和单词
+SESSION = ["熊大你好！", "Bear quiz 熊大", "B", "熊大 My forest", "森林里有 bees 吗？",
+           "为什么要 recycle？", "OK", "我的森林", "How many trees 俺们种了？", "谢谢熊大 👍",
+           "Bear story please", "熊大讲故事"]
+
+
+def old_detect(text):
+    chinese_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
+    return 'zh' if chinese_chars > len(text)/2 else 'en'
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def flips(detect):
+    langs, current = [], "en"
+    for message in SESSION:
+        current = detect(message, current)
+        langs.append(current)
+    return sum(a != b for a, b in zip(langs, langs[1:])), langs
+
+
+def main():
+    rng = random.Random(11)
+    print("Growing input length")
+    print(f"{'kind':<8}{'chars':>9}{'old µs':>12}{'new µs':>12}{'speed-up':>10}")
+    for kind, make in (("en", corpus._english), ("zh", corpus._chinese), ("mixed", corpus._mixed)):
+        for size in (20, 200, 2000, 20000, 200000):
+            text = make(rng, size)
+            number = max(5, 200000 // size)
+            old_us = per_call_us(lambda: old_detect(text), number)
+            new_us = per_call_us(lambda: detect_language(text, "en"), number)
+            print(f"{kind:<8}{len(text):>9}{old_us:>12.2f}{new_us:>12.2f}{old_us / new_us:>9.1f}x")
+
+    print("\nOne mixed zh/en session")
+    old_flips, old_langs = flips(lambda text, current: old_detect(text))
+    new_flips, new_langs = flips(detect_language)
+    print(f"{'message':<26}{'old':>5}{'new':>5}")
+    for message, old, new in zip(SESSION, old_langs, new_langs):
+        print(f"{message:<26}{old:>5}{new:>5}")
+    print(f"language flips: old {old_flips}, new {new_flips}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Microbenchmark: where Bear's random numbers come from, per reply.
+
+Three sources, each drawing the mix one reply uses (emoticon, Bear
+ending, tip, achievement):
+
+  global   the module-level random, shared by every thread (not reproducible)
+  Random   a random.Random per session: reproducible, but its ~2.5 KB
+           state has to be restored and saved with the session each request
+  session  SessionRandom: counter-based, 64 numbers pre-drawn per block,
+           state is [seed, position]
+
+Reports ns per draw, the per-request cost of restoring and saving each
+session generator, and format throughput (format_response, Bear
+language, emoticon) with the global module or the session's generator:
+
+    python benchmarks/bench_random.py [--draws 200000] [--replies 2000]
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import corpus
+from bench_utils import time_calls
+from eco_personality import EcoPersonality
+from session_random import SessionRandom
+from session_store import SessionState
+
+EMOTICONS = EcoPersonality.EMOTICONS['positive']
+ENDINGS = EcoPersonality.BEAR_ENDINGS['en']
+TIPS = tuple(f"tip {i}" for i in range(40))
+
+
+class ModuleRandom:
+    """The global random module behind the SessionRandom interface (the old behaviour)"""
+    __slots__ = ()
+
+    def chance(self, probability):
+        return random.random() < probability
+
+    choice = staticmethod(random.choice)
+    randrange = staticmethod(random.randrange)
+    random = staticmethod(random.random)
+
+
+def reply_draws_global():
+    if random.random() < 0.8:
+        random.choice(EMOTICONS)
+    if random.random() < 0.3:
+        random.choice(ENDINGS)
+    random.choice(TIPS)
+
+
+def reply_draws(rng):
+    def draws():
+        if rng.random() < 0.8:
+            rng.choice(EMOTICONS)
+        if rng.random() < 0.3:
+            rng.choice(ENDINGS)
+        rng.choice(TIPS)
+    return draws
+
+
+def reply_draws_session(rng):
+    def draws():
+        if rng.chance(0.8):
+            rng.choice(EMOTICONS)
+        if rng.chance(0.3):
+            rng.choice(ENDINGS)
+        rng.choice(TIPS)
+    return draws
+
+
+def per_draw_ns(fn, replies, rounds):
+    # 每条回复平均 1 + 0.8 + 0.3 + 1 = 4.1 次抽取
+    best = min(timeit.repeat(fn, number=replies, repeat=rounds))
+    return best / (replies * 4.1) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--draws", type=int, default=200000, help="replies' worth of draws to time")
+    parser.add_argument("--replies", type=int, default=2000, help="model answers to format")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'draws':<10}{'ns/draw':>10}")
+    for name, fn in (("global", reply_draws_global),
+                     ("Random", reply_draws(random.Random(7))),
+                     ("session", reply_draws_session(SessionRandom(7)))):
+        print(f"{name:<10}{per_draw_ns(fn, args.draws, args.rounds):>10.0f}")
+
+    # 会话生成器每个请求要从存储里恢复、答完再存回去
+    mt = random.Random(7)
+    mt_state = json.dumps(mt.getstate())
+    sr_state = json.dumps(SessionRandom(7).state())
+
+    def restore_save_mt():
+        version, internal, gauss = json.loads(mt_state)
+        mt.setstate((version, tuple(internal), gauss))
+        return json.dumps(mt.getstate())
+
+    def restore_save_session():
+        rng = SessionRandom(*json.loads(sr_state))
+        rng.choice(TIPS)  # 恢复后第一次抽取要生成一块
+        return json.dumps(rng.state())
+
+    print(f"\n{'state':<10}{'µs/request':>12}{'stored B':>10}")
+    for name, fn, size in (("Random", restore_save_mt, len(mt_state)),
+                           ("session", restore_save_session, len(sr_state))):
+        best = min(timeit.repeat(fn, number=2000, repeat=args.rounds)) / 2000
+        print(f"{name:<10}{best * 1e6:>12.2f}{size:>10}")
+
+    replies = corpus.model_outputs(args.replies)
+    print(f"\n{'format':<10}{'lang':>5}{'mean µs':>10}{'p99 µs':>10}{'ops/s':>12}")
+    for lang in ("zh", "en"):
+        for name, rng in (("global", ModuleRandom()), ("session", SessionRandom(7))):
+            persona = EcoPersonality().for_session(SessionState(current_lang=lang, rng=rng))
+
+            def call(text):
+                persona.interaction_count += 1  # 每 5 次带一条成就
+                persona._add_emoticon(persona.format_response(persona._apply_bear_language(text))['display'],
+                                      'positive')
+
+            timing = time_calls(call, replies, args.rounds)
+            print(f"{name:<10}{lang:>5}{timing['mean_us']:>10.2f}{timing['p99_us']:>10.2f}"
+                  f"{timing['ops_per_s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
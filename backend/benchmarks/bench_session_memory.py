@@ -0,0 +1,92 @@
+"""Memory benchmark: bytes held per session once a class has gone idle.
+
+Every simulated student chats a little (a question, a quiz, a story),
+then goes quiet. Reports the Python heap (tracemalloc) held by the
+session store per session, split into hot sessions (the LRU of live
+SessionState objects) and idle ones (the backend), plus the disk used
+for spilled sessions:
+
+    python benchmarks/bench_session_memory.py [--sessions 20000] [--resident 2000] [--history]
+
+--resident 0 keeps every idle session in memory (packed), as before spilling.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("ECO_MODEL_PROVIDER", "stub")
+os.environ.setdefault("ECO_STUB_LATENCY_MS", "0")
+os.environ.setdefault("ECO_CONFIG_RELOAD_SECONDS", "0")
+os.environ.setdefault("ECO_LEDGER", "0")
+
+SCRIPT = {
+    "en": ["Hello Bear!", "Bear quiz", "B", "Bear story"],
+    "zh": ["熊大你好！", "熊大考考你", "A", "熊大讲故事"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--hot", type=int, default=1024, help="LRU size (ECO_SESSION_CACHE_SIZE)")
+    parser.add_argument("--resident", type=int, default=int(os.getenv("ECO_SESSION_RESIDENT", "10000")),
+                        help="idle sessions kept in memory before spilling (ECO_SESSION_RESIDENT, 0 = no spill)")
+    parser.add_argument("--history", action="store_true", help="keep conversation history (off by default)")
+    args = parser.parse_args()
+    if not args.history:
+        os.environ["ECO_HISTORY_TOKENS"] = "0"
+    os.environ["ECO_SESSION_CACHE_SIZE"] = str(args.hot)
+    os.environ["ECO_SESSION_RESIDENT"] = str(args.resident)
+    tmp = tempfile.mkdtemp(prefix="eco-sessions-")
+    os.environ.setdefault("ECO_SESSION_SPILL_DB", os.path.join(tmp, "spill.db"))
+
+    from Gemini import EcoAISystem
+    from session_store import create_session_store
+
+    ai = EcoAISystem()
+    ai.process_query("Hello Bear!")  # 先把模型、内容库等共享对象建好，不算进会话
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    store = create_session_store()
+    started = time.perf_counter()
+    for n in range(args.sessions):
+        session_id = f"student-{n:08d}"
+        for message in SCRIPT["zh" if n % 3 == 0 else "en"]:
+            with store.session(session_id) as state:
+                ai.process_query(message, state)
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    total = tracemalloc.get_traced_memory()[0] - before
+    # 清空 LRU，剩下的就是后端里的空闲会话
+    store._lru.clear()
+    gc.collect()
+    idle = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    hot = total - idle
+
+    spill = os.environ["ECO_SESSION_SPILL_DB"]
+    disk = sum(os.path.getsize(p) for p in (spill, spill + "-wal") if os.path.exists(p))
+    cold = store.backend.stats()["spilled"] if hasattr(store.backend, "stats") else 0
+    print(f"sessions: {args.sessions} ({args.hot} hot), history: {'on' if args.history else 'off'}, "
+          f"{args.sessions * 4 / elapsed:.0f} messages/s")
+    print(f"heap, all sessions:   {total / args.sessions:>8.0f} B/session  ({total / 1e6:.1f} MB)")
+    print(f"heap, hot (LRU):      {hot / max(1, min(args.hot, args.sessions)):>8.0f} B/session")
+    print(f"heap, idle (backend): {idle / args.sessions:>8.0f} B/session")
+    print(f"disk, spilled:        {disk / max(1, cold):>8.0f} B/session  ({disk / 1e6:.1f} MB)")
+
+    # 空闲会话能按需读回来
+    state = store.get("student-00000001")
+    assert state.interaction_count == len(SCRIPT["en"]), state.interaction_count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cold-start benchmark: import time and time to first answer, each run in a fresh process.
+
+Phases (medians over --runs):
+  import Gemini        module import (no model SDK)
+  EcoAISystem()        config, matchers, content store, ledger; no model
+  first local answer   "help" before any model exists
+  model build          create the provider (for gemini: import + configure the SDK)
+  first model answer   one model-bound message (stub model unless --provider gemini)
+  import api_server    Flask app ready to serve
+
+    python benchmarks/bench_startup.py [--runs 5] [--provider stub|gemini]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from bench_utils import percentile
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, time
+marks = {}
+started = time.perf_counter()
+import Gemini
+marks["import Gemini"] = time.perf_counter() - started
+t = time.perf_counter()
+ai = Gemini.EcoAISystem()
+marks["EcoAISystem()"] = time.perf_counter() - t
+t = time.perf_counter()
+ai.process_query("help")
+marks["first local answer"] = time.perf_counter() - t
+t = time.perf_counter()
+ai.model
+marks["model build"] = time.perf_counter() - t
+if ANSWER:
+    t = time.perf_counter()
+    ai.process_query("How do bees help the forest?")
+    marks["first model answer"] = time.perf_counter() - t
+marks["total"] = time.perf_counter() - started
+print("@@" + json.dumps(marks))
+"""
+
+SERVER = r"""
+import json, time
+started = time.perf_counter()
+import api_server
+print("@@" + json.dumps({"import api_server": time.perf_counter() - started}))
+"""
+
+
+def run(code, env):
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(next(line[2:] for line in out.splitlines() if line.startswith("@@")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", choices=["stub", "gemini"], default="stub",
+                        help="gemini builds the real SDK client but never calls it")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="eco-startup-")
+    env = dict(os.environ, PYTHONPATH=str(BACKEND), ECO_MODEL_PROVIDER=args.provider,
+               ECO_STUB_LATENCY_MS="0", ECO_CONFIG_RELOAD_SECONDS="0", ECO_MODEL_WARMUP="0",
+               ECO_LEDGER_DB=os.path.join(tmp, "ledger.db"))
+    child = CHILD.replace("ANSWER", str(args.provider == "stub"))
+    samples = {}
+    for _ in range(args.runs):
+        for code in (child, SERVER):
+            for phase, seconds in run(code, env).items():
+                samples.setdefault(phase, []).append(seconds * 1000)
+
+    print(f"{'phase':<22}{'p50 ms':>10}{'max ms':>10}")
+    for phase, values in samples.items():
+        print(f"{phase:<22}{percentile(values, 50):>10.1f}{max(values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
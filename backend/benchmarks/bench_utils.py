@@ -0,0 +1,51 @@
+"""Timing and allocation helpers shared by the benchmark scripts."""
+import time
+import tracemalloc
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_calls(fn, inputs, rounds=3):
+    """Per-call latency over every input, best round kept. Returns a summary dict (µs)"""
+    best = None
+    for _ in range(rounds):
+        samples = []
+        for item in inputs:
+            started = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - started) * 1e6)
+        if best is None or sum(samples) < sum(best):
+            best = samples
+    total_s = sum(best) / 1e6
+    return {
+        "calls": len(best),
+        "mean_us": round(sum(best) / len(best), 3),
+        "p50_us": round(percentile(best, 50), 3),
+        "p99_us": round(percentile(best, 99), 3),
+        "ops_per_s": round(len(best) / total_s, 1) if total_s else 0.0,
+    }
+
+
+def measure_allocations(fn, inputs):
+    """Average traced bytes allocated per call (peak) and still held afterwards (retained)"""
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        for item in inputs:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(item)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes_per_call": round(peak_total / len(inputs), 1),
+        "retained_bytes_per_call": round(retained / len(inputs), 1),
+    }
@@ -0,0 +1,143 @@
+"""Concurrency check for prompt coalescing (single-flight) with a slow stub model.
+
+A class of students sends the same question at the same moment. With
+coalescing on, the stub model must be called once per distinct question
+while each student still gets their own decorated reply; with it off,
+once per student. Exits 1 if any expectation fails:
+
+    python benchmarks/check_coalescing.py [--students 40] [--latency-ms 300]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("ECO_CONFIG_RELOAD_SECONDS", "0")
+os.environ.setdefault("ECO_LEDGER", "0")
+os.environ.setdefault("ECO_HISTORY_TOKENS", "0")  # 没有上下文，问题相同就能合并
+os.environ.setdefault("ECO_LLM_QUEUE", "100000")
+
+from Gemini import EcoAISystem
+from model_providers import StubProvider
+from response_cache import ResponseCache
+from session_store import SessionState
+
+# 同一个问题的不同写法（大小写、标点）归一化后是同一个键
+SAME_QUESTION = ["Why should we recycle paper?", "why should we recycle paper", "WHY should we recycle paper?!"]
+THREE_QUESTIONS = ["Why should we recycle paper?", "How do bees help flowers?", "为什么要保护湿地？"]
+
+
+def build(coalesce, latency_ms, error_rate=0.0):
+    os.environ["ECO_COALESCE"] = "1" if coalesce else "0"
+    model = StubProvider(latency_ms=latency_ms, error_rate=error_rate, seed=1)
+    # 关掉回答缓存，只看同时在途的请求能否合并
+    return EcoAISystem(model=model, cache=ResponseCache(max_entries=0)), model
+
+
+def ask_together(ai, messages):
+    """Every message from its own session, released at the same instant; returns (replies, seconds)"""
+    replies = [None] * len(messages)
+    barrier = threading.Barrier(len(messages))
+
+    def student(i):
+        barrier.wait()
+        replies[i] = ai.process_query(messages[i], SessionState())
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(len(messages))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return replies, time.perf_counter() - started
+
+
+async def ask_together_async(ai, messages):
+    started = time.perf_counter()
+    replies = await asyncio.gather(*(ai.process_query_async(m, SessionState()) for m in messages))
+    return replies, time.perf_counter() - started
+
+
+async def leader_gives_up(ai, messages, after_s):
+    """Like ask_together_async, but the first student (the leader) is cancelled mid-call"""
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(ai.process_query_async(m, SessionState())) for m in messages]
+    await asyncio.sleep(after_s)
+    tasks[0].cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return results[1:], time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+    n = args.students
+    class_same = [SAME_QUESTION[i % len(SAME_QUESTION)] for i in range(n)]
+    class_three = [THREE_QUESTIONS[i % len(THREE_QUESTIONS)] for i in range(n)]
+
+    checks = []
+    print(f"{'scenario':<34}{'requests':>9}{'model calls':>13}{'wall ms':>9}{'coalesced':>11}")
+
+    def report(name, ai, model, replies, seconds, expected_calls):
+        stats = ai.flights.stats()
+        print(f"{name:<34}{len(replies):>9}{model.calls:>13}{seconds * 1000:>9.0f}{stats['coalesced_ratio']:>11.0%}")
+        checks.append((name, model.calls == expected_calls and all(replies),
+                       f"expected {expected_calls} model calls, got {model.calls}"))
+
+    ai, model = build(False, args.latency_ms)
+    replies, seconds = ask_together(ai, class_same)
+    report("same question, coalescing off", ai, model, replies, seconds, n)
+
+    ai, model = build(True, args.latency_ms)
+    replies, seconds = ask_together(ai, class_same)
+    report("same question, threads", ai, model, replies, seconds, 1)
+    # 模型回答只有一份，表情、小贴士和页脚每人各自一份
+    bodies = {reply.split("\n\n")[0] for reply in replies}
+    checks.append(("each reply decorated separately", len(set(replies)) > 1,
+                   f"{len(set(replies))} distinct replies, {len(bodies)} distinct bodies"))
+
+    ai, model = build(True, args.latency_ms)
+    replies, seconds = ask_together(ai, class_three)
+    report("three questions, threads", ai, model, replies, seconds, len(THREE_QUESTIONS))
+
+    ai, model = build(True, args.latency_ms)
+    replies, seconds = asyncio.run(ask_together_async(ai, class_same))
+    report("same question, asyncio", ai, model, replies, seconds, 1)
+
+    # 发起者被取消（客户端断开）不影响其他等待者
+    ai, model = build(True, args.latency_ms)
+    replies, seconds = asyncio.run(leader_gives_up(ai, class_same, args.latency_ms / 3000))
+    report("same question, leader cancelled", ai, model, replies, seconds, 1)
+    checks.append(("followers answered after the leader left",
+                   all(isinstance(reply, str) and "Error occurred" not in reply for reply in replies),
+                   f"{sum(not isinstance(reply, str) for reply in replies)} followers got an exception"))
+
+    # 失败也共享：一次调用失败，所有等待者都拿到错误，且只算一次熔断失败
+    os.environ["ECO_MODEL_RETRIES"] = "0"
+    ai, model = build(True, args.latency_ms, error_rate=1.0)
+    replies, seconds = ask_together(ai, class_same)
+    report("same question, model failing", ai, model, replies, seconds, 1)
+    checks.append(("failure shared by every waiter",
+                   all("Error occurred" in reply for reply in replies) and ai.breaker.failures == 1,
+                   f"breaker failures {ai.breaker.failures}"))
+
+    # 调用结束后不留结果：下一次同样的问题重新调用模型
+    ai.process_query(SAME_QUESTION[0], SessionState())
+    checks.append(("nothing kept after the call", model.calls == 2, f"{model.calls} model calls"))
+
+    print()
+    failed = 0
+    for name, ok, detail in checks:
+        print(f"{'✅' if ok else '❌'} {name}" + ("" if ok else f": {detail}"))
+        failed += not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Check that commands written in one language work in a session of the other.
+
+A message like "Bear quiz 熊大" in a Chinese session (or "熊大考考你 Bear"
+in an English one) must run the matched command, count it under its
+handler in eco_commands_total and leave no error in the reply. Exits 1
+if any case fails:
+
+    python benchmarks/check_commands.py
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("ECO_MODEL_PROVIDER", "stub")
+os.environ.setdefault("ECO_STUB_LATENCY_MS", "0")
+os.environ.setdefault("ECO_CONFIG_RELOAD_SECONDS", "0")
+os.environ.setdefault("ECO_MODEL_WARMUP", "0")
+os.environ.setdefault("ECO_LEDGER", "0")
+
+from Gemini import EcoAISystem
+from metrics import COMMANDS
+from session_store import SessionState
+
+# (会话语言, 消息, 应命中的处理函数)
+CASES = [
+    ("zh", "Bear quiz 熊大", "generate_quiz"),
+    ("zh", "熊大 Bear story", "generate_forest_story"),
+    ("zh", "My forest 熊大", "show_forest"),
+    ("zh", "Patrol forest 熊大", "forest_patrol"),
+    ("en", "熊大考考你 Bear", "generate_quiz"),
+    ("en", "Bear 熊大讲故事", "generate_forest_story"),
+    ("en", "我的森林 Bear", "show_forest"),
+    ("en", "巡逻森林 please", "forest_patrol"),
+]
+
+
+def main():
+    ai = EcoAISystem()
+    failed = 0
+    for lang, message, handler in CASES:
+        state = SessionState(current_lang=lang)
+        before = COMMANDS.value(handler)
+        reply = ai.process_query(message, state)
+        problems = []
+        if "Error occurred" in reply:
+            problems.append(reply.splitlines()[0])
+        if COMMANDS.value(handler) != before + 1:
+            problems.append(f"{handler} not counted")
+        if handler == "generate_quiz" and not state.quiz_answers.get('waiting'):
+            problems.append("no quiz waiting for an answer")
+        print(f"{'✅' if not problems else '❌'} [{lang}] {message!r} -> {handler}"
+              + (f": {'; '.join(problems)}" if problems else ""))
+        failed += bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
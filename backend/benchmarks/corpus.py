@@ -0,0 +1,61 @@
+"""Seeded zh/en/mixed message corpora of realistic lengths for the benchmarks."""
+import random
+
+EN_WORDS = ("forest tree bear bees honey river people we should know environment eco "
+            "protect plant recycle paper energy climate habitat animals squirrel owl "
+            "the a to and of in is it for with you I my our can how why what").split()
+ZH_PHRASES = ["你们", "应该", "知道", "环保", "生态", "森林", "保护", "小动物", "垃圾分类",
+              "节约用纸", "二氧化碳", "可以", "蜜蜂", "大树", "栖息地", "怎么", "为什么", "熊大"]
+COMMANDS = ["help", "Bear quiz", "My forest", "My impact", "Bear story", "Patrol forest",
+            "熊大考考你", "我的森林", "我的贡献", "熊大讲故事", "巡逻森林"]
+TRIGGERS = ["logging", "pollution", "砍树", "光头强"]
+
+
+def _english(rng, n_chars):
+    words = []
+    while sum(len(w) + 1 for w in words) < n_chars:
+        words.append(rng.choice(EN_WORDS))
+    return " ".join(words).capitalize() + rng.choice([".", "?", "!"])
+
+
+def _chinese(rng, n_chars):
+    text = ""
+    while len(text) < n_chars:
+        text += rng.choice(ZH_PHRASES) + rng.choice(["", "", "，", "的", "。"])
+    return text
+
+
+def _mixed(rng, n_chars):
+    half = max(n_chars // 2, 1)
+    parts = [_english(rng, half), _chinese(rng, half)]
+    rng.shuffle(parts)
+    return " ".join(parts)
+
+
+def messages(n, seed=1, length=(8, 120)):
+    """User messages: questions in zh/en/mixed, plus commands and angry triggers"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.2:
+            out.append(rng.choice(COMMANDS))
+            continue
+        size = rng.randint(*length)
+        text = rng.choice([_english, _chinese, _mixed])(rng, size)
+        if roll < 0.25:
+            text += " " + rng.choice(TRIGGERS)
+        out.append(text)
+    return out
+
+
+def model_outputs(n, seed=2, length=(300, 1500)):
+    """Long answers shaped like the model's (the input to rewriting/formatting)"""
+    rng = random.Random(seed)
+    return [rng.choice([_english, _chinese])(rng, rng.randint(*length)) for _ in range(n)]
+
+
+def long_pastes(n, seed=3, length=(5000, 20000)):
+    """Very long pasted texts (worst case for per-character scans)"""
+    rng = random.Random(seed)
+    return [rng.choice([_english, _chinese, _mixed])(rng, rng.randint(*length)) for _ in range(n)]
@@ -0,0 +1,172 @@
+"""Load test: threaded Flask serving vs. the asyncio (ASGI) serving mode.
+
+Both apps run in-process against the offline StubProvider, so the
+numbers measure serving overhead and queueing, not the network:
+
+    python benchmarks/load_test.py --requests 2000 --clients 64 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# 服务模块导入时就会创建模型，先切到离线 stub
+os.environ.setdefault("ECO_MODEL_PROVIDER", "stub")
+os.environ.setdefault("ECO_RATE_LIMIT", "0")  # 所有客户端都来自 127.0.0.1
+os.environ.setdefault("ECO_LLM_QUEUE", "100000")  # 测吞吐，不测排队拒绝
+os.environ.setdefault("ECO_LEDGER", "0")  # 压测会话不写进真实的影响力账本（和排行榜）
+
+from bench_utils import percentile
+from model_providers import StubProvider
+from response_cache import ResponseCache
+
+LOCAL_COMMANDS = ["help", "Bear quiz", "My forest", "My impact"]
+MODEL_QUESTIONS = [
+    "How can I protect the forest near my school?",
+    "Why are bees important for trees?",
+    "怎么保护森林",
+    "为什么要垃圾分类？",
+]
+
+
+def build_workload(n, local_ratio, seed):
+    rng = random.Random(seed)
+    return [
+        (rng.choice(LOCAL_COMMANDS), True) if rng.random() < local_ratio
+        else (rng.choice(MODEL_QUESTIONS), False)
+        for _ in range(n)
+    ]
+
+
+def summarise(mode, samples, elapsed):
+    local = [lat for lat, is_local in samples if is_local]
+    model = [lat for lat, is_local in samples if not is_local]
+    every = [lat for lat, _ in samples]
+    return {
+        "mode": mode,
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(every, 50) * 1000, 2),
+        "p99_ms": round(percentile(every, 99) * 1000, 2),
+        "local_p99_ms": round(percentile(local, 99) * 1000, 2),
+        "model_p99_ms": round(percentile(model, 99) * 1000, 2),
+    }
+
+
+def run_threaded(workload, clients, workers, model, cache):
+    """Flask app behind a fixed pool of worker threads (like gunicorn --threads)"""
+    import api_server
+    from Gemini import EcoAISystem
+    api_server.ai_system = EcoAISystem(model=model, cache=cache)
+    flask_client = api_server.app.test_client()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    samples, lock = [], threading.Lock()
+
+    def one_request(message, session_id):
+        resp = flask_client.post('/api/chat', json={'message': message},
+                                 headers={'X-Session-Id': session_id})
+        assert resp.status_code == 200, resp.data
+
+    def client(idx, items):
+        session_id = f"loadtest-{idx:04d}"
+        for message, is_local in items:
+            started = time.perf_counter()
+            pool.submit(one_request, message, session_id).result()
+            with lock:
+                samples.append((time.perf_counter() - started, is_local))
+
+    threads = [threading.Thread(target=client, args=(i, workload[i::clients])) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    return summarise("threaded", samples, elapsed)
+
+
+async def _asgi_post(app, path, payload, session_id):
+    body = json.dumps(payload).encode()
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path,
+             "headers": [(b"content-type", b"application/json"),
+                         (b"x-session-id", session_id.encode())]}
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+def run_async(workload, clients, model, cache):
+    """ASGI app on one event loop, model calls awaited"""
+    import asgi_server
+    from Gemini import EcoAISystem
+    asgi_server.ai_system = EcoAISystem(model=model, cache=cache)
+    samples = []
+
+    async def client(idx, items):
+        session_id = f"loadtest-{idx:04d}"
+        for message, is_local in items:
+            started = time.perf_counter()
+            status = await _asgi_post(asgi_server.app, '/api/chat', {'message': message}, session_id)
+            assert status == 200
+            samples.append((time.perf_counter() - started, is_local))
+
+    async def main():
+        await asyncio.gather(*(client(i, workload[i::clients]) for i in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return summarise("async", samples, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent closed-loop clients")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads for the Flask mode")
+    parser.add_argument("--latency-ms", type=float, default=200, help="stub model median latency")
+    parser.add_argument("--dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform: ± ms, lognormal: sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--local-ratio", type=float, default=0.3, help="share of local commands")
+    parser.add_argument("--mode", choices=["both", "threaded", "async"], default="both")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    workload = build_workload(args.requests, args.local_ratio, args.seed)
+    model = StubProvider(latency_ms=args.latency_ms, distribution=args.dist, jitter=args.jitter,
+                         error_rate=args.error_rate, seed=args.seed)
+    results = []
+    if args.mode in ("both", "threaded"):
+        results.append(run_threaded(workload, args.clients, args.workers, model,
+                                    ResponseCache(max_entries=2048 if args.cache else 0)))
+    if args.mode in ("both", "async"):
+        results.append(run_async(workload, args.clients, model,
+                                 ResponseCache(max_entries=2048 if args.cache else 0)))
+
+    print(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'local p99':>12}{'model p99':>12}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['local_p99_ms']:>12}{r['model_p99_ms']:>12}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
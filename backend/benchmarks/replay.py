@@ -0,0 +1,223 @@
+"""Replay recorded chat traffic through EcoAISystem, offline, for capacity planning.
+
+The transcript is JSONL, one message per line:
+
+    {"session_id": "abc123", "message": "Bear quiz"}
+
+("session"/"text"/"input" are accepted too; lines without a session id
+form one session). Every session's messages go through the command-line
+chat loop (Gemini.chat_loop) in their original order. Sessions are spread
+over --processes worker processes, and each one is seeded from --seed and
+its session id. The replies are therefore the same for any process count,
+and the printed digest shows it.
+
+The model is the offline stub (--latency-ms 0 measures CPU only). With
+--cache-db, answers come from a response-cache SQLite file (ECO_CACHE_DB)
+first, and only misses go to the stub.
+
+    python benchmarks/replay.py traffic.jsonl [--processes 4] [--seed 7] [--output report.json]
+    python benchmarks/replay.py --synthesize 5000 > traffic.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("ECO_CONFIG_RELOAD_SECONDS", "0")
+os.environ.setdefault("ECO_MODEL_WARMUP", "0")
+os.environ.setdefault("ECO_LEDGER", "0")  # 回放不写真实的影响力账本
+os.environ.setdefault("ECO_LLM_QUEUE", "100000")
+
+from bench_utils import percentile
+
+MESSAGE_KEYS = ("message", "text", "input")
+SESSION_KEYS = ("session_id", "session")
+
+_ai = None  # 每个工作进程一个 EcoAISystem
+_seed = 0
+
+
+def read_transcript(path):
+    """{session id: [messages in order]}, and the number of lines skipped"""
+    sessions, skipped = {}, 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                message = next(record[k] for k in MESSAGE_KEYS if isinstance(record.get(k), str))
+            except (ValueError, StopIteration, AttributeError):
+                skipped += 1
+                continue
+            session_id = next((str(record[k]) for k in SESSION_KEYS if record.get(k)), "replay")
+            sessions.setdefault(session_id, []).append(message)
+    return sessions, skipped
+
+
+def synthesize(n, seed):
+    """A transcript shaped like class traffic: short sessions mixing questions, commands and quiz answers"""
+    import corpus
+    rng = random.Random(seed)
+    questions = corpus.messages(n, seed=seed)
+    session, left = None, 0
+    for message in questions:
+        if left == 0:
+            session, left = f"s{rng.getrandbits(48):012x}", rng.randint(2, 12)
+        yield {"session_id": session, "message": message}
+        if message in ("Bear quiz", "熊大考考你"):
+            yield {"session_id": session, "message": rng.choice("ABC")}
+        left -= 1
+
+
+def _init_worker(seed, latency_ms, cache_db):
+    global _ai, _seed
+    from Gemini import EcoAISystem
+    from model_providers import StubProvider
+    from response_cache import ResponseCache
+
+    _seed = seed
+    # 没有 --cache-db 时不缓存：命中与否取决于会话的处理顺序，结果就和进程数有关了
+    cache = ResponseCache(path=cache_db) if cache_db else ResponseCache(max_entries=0)
+    _ai = EcoAISystem(model=StubProvider(latency_ms=latency_ms, seed=seed), cache=cache)
+
+
+def command_label(ai, persona, message):
+    """Which kind of turn this message will be, judged before it is answered"""
+    lowered = message.lower()
+    if lowered == "help":
+        return "help"
+    if lowered in ai.IMPACT_COMMANDS:
+        return "my_impact"
+    if persona.is_quiz_answer(message):
+        return "quiz_answer"
+    command = persona.find_command(message)
+    if command:
+        return command[1].lstrip('_')
+    return "chat"
+
+
+def replay_sessions(sessions):
+    """Replay [(session id, messages)] in this worker; returns samples, a digest per session and the time taken"""
+    from Gemini import chat_loop
+    from session_random import SessionRandom, session_seed
+    from session_store import SessionState
+
+    started = time.perf_counter()
+    samples = []  # (label, seconds)
+    digests = {}
+    for session_id, messages in sessions:
+        # 每个会话自己的随机数，由 --seed 和会话 id 决定，与进程和处理顺序无关
+        state = SessionState(session_id=session_id, rng=SessionRandom(session_seed(session_id, base=_seed)))
+        persona = _ai._persona_for(state)
+        digest = hashlib.sha1()
+        labels = []
+
+        def labelled():
+            for message in messages:
+                # 在回答之前判断（之后会话状态就变了，比如答题等待已清除）
+                labels.append(command_label(_ai, persona, message.strip()))
+                yield message
+
+        def on_reply(_, response, seconds):
+            samples.append((labels[-1], seconds))
+            digest.update(response.encode("utf-8"))
+            # 摘要在后台线程里做，早一轮晚一轮会改变之后的上下文；回放时等它做完（不计时）
+            _ai.memory.wait()
+
+        chat_loop(_ai, labelled(), on_reply, state)
+        digests[session_id] = digest.hexdigest()
+    return samples, digests, time.perf_counter() - started
+
+
+def summarize(samples):
+    by_label = {}
+    for label, seconds in samples:
+        by_label.setdefault(label, []).append(seconds * 1000)
+    by_label["all"] = [seconds * 1000 for _, seconds in samples]
+    return {
+        label: {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p90_ms": round(percentile(values, 90), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(max(values), 3),
+        }
+        for label, values in sorted(by_label.items(), key=lambda item: -len(item[1]))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcript", nargs="?", help="JSONL file of recorded messages")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub model latency per call")
+    parser.add_argument("--cache-db", help="response cache SQLite file to answer from before the stub")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--synthesize", type=int, metavar="N",
+                        help="print a synthetic transcript of N messages instead of replaying")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        for record in synthesize(args.synthesize, args.seed):
+            print(json.dumps(record, ensure_ascii=False))
+        return
+    if not args.transcript:
+        parser.error("a transcript file is required")
+
+    sessions, skipped = read_transcript(args.transcript)
+    processes = max(1, args.processes)
+    # 同一会话的消息必须在同一进程里按顺序回放；按会话 id 分组
+    shards = [[] for _ in range(processes)]
+    for session_id, messages in sessions.items():
+        shards[zlib.crc32(session_id.encode("utf-8")) % processes].append((session_id, messages))
+
+    with Pool(processes, initializer=_init_worker,
+              initargs=(args.seed, args.latency_ms, args.cache_db)) as pool:
+        results = pool.map(replay_sessions, shards)
+    # 从最慢的进程算墙钟时间，不含进程启动和建 EcoAISystem 的时间
+    wall = max(elapsed for _, _, elapsed in results)
+
+    samples = [sample for shard_samples, _, _ in results for sample in shard_samples]
+    digests = {}
+    for _, shard_digests, _ in results:
+        digests.update(shard_digests)
+    digest = hashlib.sha1("".join(digests[sid] for sid in sorted(digests)).encode()).hexdigest()[:16]
+    busy = sum(seconds for _, seconds in samples)
+    report = {
+        "messages": len(samples),
+        "sessions": len(sessions),
+        "skipped_lines": skipped,
+        "processes": processes,
+        "seed": args.seed,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(samples) / wall, 1) if wall else 0.0,
+        # 单进程满负荷时每秒能回答多少条：按它和峰值流量估算要几个进程
+        "per_process_per_s": round(len(samples) / busy, 1) if busy else 0.0,
+        "reply_digest": digest,
+        "latency": summarize(samples) if samples else {},
+    }
+
+    print(f"{report['messages']} messages in {report['sessions']} sessions, {processes} processes, "
+          f"seed {args.seed}" + (f", {skipped} lines skipped" if skipped else ""))
+    print(f"throughput: {report['throughput_per_s']}/s overall, {report['per_process_per_s']}/s per busy process")
+    print(f"reply digest: {digest} (same seed and transcript -> same digest)\n")
+    print(f"{'command':<24}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, row in report["latency"].items():
+        print(f"{label:<24}{row['count']:>8}{row['mean_ms']:>10.3f}{row['p50_ms']:>10.3f}"
+              f"{row['p90_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['max_ms']:>10.3f}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
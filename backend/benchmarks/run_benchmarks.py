@@ -0,0 +1,202 @@
+"""Benchmark suite for the chat hot path, end to end.
+
+Measures per-stage latency and allocations over seeded zh/en/mixed
+corpora, then drives the Flask app over real HTTP with the stub model.
+Results are written as JSON so two commits can be compared:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --output after.json --compare before.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+os.environ.setdefault("ECO_MODEL_PROVIDER", "stub")
+os.environ.setdefault("ECO_RATE_LIMIT", "0")  # 所有客户端都来自 127.0.0.1
+os.environ.setdefault("ECO_LLM_QUEUE", "100000")  # 测吞吐，不测排队拒绝
+os.environ.setdefault("ECO_LEDGER", "0")  # 压测会话不写进真实的影响力账本（和排行榜）
+
+import corpus
+from bench_utils import measure_allocations, percentile, time_calls
+from eco_personality import EcoPersonality
+from model_providers import StubProvider
+from response_cache import ResponseCache
+from session_store import SessionState
+
+
+def stage_benchmarks(size, rounds):
+    persona = EcoPersonality().for_session(SessionState())
+    messages = corpus.messages(size)
+    outputs = corpus.model_outputs(max(size // 10, 20))
+    pastes = corpus.long_pastes(max(size // 100, 5))
+
+    def detect(text):
+        persona._detect_language(text)
+
+    def process_input(text):
+        persona.process_input(text)
+
+    def bear_language(text):
+        persona.current_lang = persona._detect_language(text)
+        persona._apply_bear_language(text)
+
+    def format_response(text):
+        persona.current_lang = persona._detect_language(text)
+        persona.format_response(text)
+
+    from Gemini import EcoAISystem
+    ai = EcoAISystem(model=StubProvider(latency_ms=0), cache=ResponseCache(max_entries=0))
+    state = SessionState()
+
+    def process_query(text):
+        ai.process_query(text, state)
+
+    stages = {
+        "detect_language/messages": (detect, messages),
+        "detect_language/long_pastes": (detect, pastes),
+        "process_input": (process_input, messages),
+        "apply_bear_language": (bear_language, outputs),
+        "format_response": (format_response, outputs),
+        "process_query(stub)": (process_query, messages),
+    }
+    results = {}
+    for name, (fn, inputs) in stages.items():
+        results[name] = {**time_calls(fn, inputs, rounds), **measure_allocations(fn, inputs)}
+    return results
+
+
+def http_benchmark(requests, clients, latency_ms):
+    """Real HTTP against the Flask app (werkzeug threaded server) with the stub model"""
+    from werkzeug.serving import make_server
+    import api_server
+    from Gemini import EcoAISystem
+
+    api_server.ai_system = EcoAISystem(model=StubProvider(latency_ms=latency_ms, seed=1),
+                                       cache=ResponseCache(max_entries=0))
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # 不打印每条请求
+    server = make_server("127.0.0.1", 0, api_server.app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    messages = corpus.messages(requests, seed=5)
+    samples, errors, lock = [], [0], threading.Lock()
+
+    def client(idx):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        headers = {"Content-Type": "application/json", "X-Session-Id": f"bench-client-{idx:04d}"}
+        for message in messages[idx::clients]:
+            body = json.dumps({"message": message})
+            started = time.perf_counter()
+            conn.request("POST", "/api/chat", body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed * 1000)
+                if resp.status != 200:
+                    errors[0] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    return {
+        "requests": len(samples),
+        "errors": errors[0],
+        "clients": clients,
+        "stub_latency_ms": latency_ms,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print stage-by-stage deltas; return the names that got slower than threshold"""
+    regressions = []
+    print(f"\n{'stage':<32}{'before µs':>12}{'after µs':>12}{'change':>10}")
+    for name, result in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        change = (result["mean_us"] - old["mean_us"]) / old["mean_us"] if old["mean_us"] else 0.0
+        flag = "  ⚠️" if change > threshold else ""
+        print(f"{name:<32}{old['mean_us']:>12.1f}{result['mean_us']:>12.1f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    if current.get("http") and baseline.get("http"):
+        print(f"{'http rps':<32}{baseline['http']['rps']:>12}{current['http']['rps']:>12}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="messages per stage corpus")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--http-requests", type=int, default=1000)
+    parser.add_argument("--http-clients", type=int, default=16)
+    parser.add_argument("--http-latency-ms", type=float, default=20)
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slow-down per stage")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "size": args.size,
+        },
+        "stages": stage_benchmarks(args.size, args.rounds),
+    }
+
+    print(f"{'stage':<32}{'mean µs':>10}{'p99 µs':>10}{'ops/s':>12}{'peak B':>10}{'kept B':>10}")
+    for name, r in results["stages"].items():
+        print(f"{name:<32}{r['mean_us']:>10.1f}{r['p99_us']:>10.1f}{r['ops_per_s']:>12.0f}"
+              f"{r['peak_bytes_per_call']:>10.0f}{r['retained_bytes_per_call']:>10.0f}")
+
+    if not args.skip_http:
+        try:
+            results["http"] = http_benchmark(args.http_requests, args.http_clients, args.http_latency_ms)
+            h = results["http"]
+            print(f"\nHTTP /api/chat: {h['rps']} req/s, p50 {h['p50_ms']} ms, p99 {h['p99_ms']} ms "
+                  f"({h['clients']} clients, stub {h['stub_latency_ms']} ms, {h['errors']} errors)")
+        except ImportError as e:
+            print(f"\n⚠️ HTTP benchmark skipped: {e}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import copy
+import json
+import string
+from pathlib import Path
+from types import MappingProxyType
+
+LANGS = ("zh", "en")
+CONFIG_PATH = Path(__file__).parent / "eco_ai_character.json"
+
+DEFAULT_CONFIG = {
+    "core_personality": {
+        "base": "Forest Guardian Bear",
+        "default_states": {
+            "happy_mode": {
+                "response": {
+                    "zh": "保护森林，熊熊有责！俺们一起行动 (•̀ᴗ•́)و",
+                    "en": "Protecting forests is my duty! Let's work together (•̀ᴗ•́)و"
+                },
+                "emoticon": ["🌲", "🐻", "💪"]
+            },
+            "angry_mode": {
+                "trigger": ["砍树", "偷猎", "污染", "光头强", "logging", "poaching", "pollution"],
+                "response": {
+                    "zh": "住手！破坏森林可不行！(╬ Ò﹏Ó)",
+                    "en": "Stop! No destroying forests! (╬ Ò﹏Ó)"
+                },
+                "visual_effect": "🐻🔥"
+            },
+            "special_triggers": []
+        }
+    },
+    "language_features": {
+        "熊大式表达": {
+            "mapping": {}
+        }
+    },
+    "interaction_behaviors": {
+        "text_response": {
+            "footer_template": {
+                "zh": "🐻 记住: {random_tip} | 减少碳排放: {carbon_offset}kg (相当于{equivalent})",
+                "en": "🐻 Tip: {random_tip} | CO₂ reduced: {carbon_offset}kg (Like {equivalent})"
+            },
+            "random_tips": {
+                "zh": [
+                    "晚上关灯省电，猫头鹰睡觉不被打扰 🦉",
+                    "节约用纸就是少砍树🌲"
+                ],
+                "en": [
+                    "Turn off lights at night to save energy! 🦉",
+                    "Walking instead of driving saves 0.2kg CO2 per km 🚶"
+                ]
+            },
+            "equivalents": {
+                "zh": ["充电10部手机 📱", "少洗1次热水澡 🚿"],
+                "en": ["charging 10 phones 📱", "1 less hot shower 🚿"]
+            },
+            "base_carbon": 0.0007
+        },
+        "forest_game": {
+            "patrol_events": [
+                {
+                    "direction": {"zh": "左", "en": "left"},
+                    "result": {
+                        "zh": "发现光头强在偷蜂蜜！用蜂巢赶跑他！(╯‵□′)╯🐝",
+                        "en": "Caught Logger stealing honey! Used beehive to chase him! (╯‵□′)╯🐝"
+                    }
+                },
+                {
+                    "direction": {"zh": "右", "en": "right"},
+                    "result": {
+                        "zh": "帮小松鼠种下橡果，明年会长出新大树！🌰➡️🌳",
+                        "en": "Helped squirrel plant an acorn! New tree coming soon! 🌰➡️🌳"
+                    }
+                }
+            ]
+        }
+    },
+    "game_settings": {
+        "carbon_achievement": {
+            "interval": 5,
+            "messages": {
+                "zh": [
+                    "🎉 你减少了{count}kg碳排放！继续努力~",
+                    "🌍 减少{count}kg碳足迹！地球感谢你！"
+                ],
+                "en": [
+                    "🎉 You've reduced {count}kg CO₂! Keep it up!",
+                    "🌍 {count}kg less carbon footprint! Earth thanks you!"
+                ]
+            }
+        }
+    }
+}
+
+
+class ConfigError(ValueError):
+    """The character config does not match the schema"""
+
+
+class MapOf:
+    """Schema node: a dict with free-form keys and values of one schema"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def per_lang(schema):
+    return {lang: schema for lang in LANGS}
+
+
+def _text_or_lang(value, path):
+    """Patrol directions/results may be one string or a per-language dict"""
+    if isinstance(value, str):
+        return value
+    _check(value, per_lang(str), path)
+    return value
+
+
+TEXT_LIST = [str]
+
+SCHEMA = {
+    "core_personality": {
+        "default_states": {
+            "happy_mode": {"response": per_lang(str)},
+            "angry_mode": {"trigger": TEXT_LIST, "response": per_lang(str)},
+            "special_triggers": [{"condition": TEXT_LIST, "actions": TEXT_LIST}]
+        }
+    },
+    "language_features": {"熊大式表达": {"mapping": MapOf(str)}},
+    "interaction_behaviors": {
+        "text_response": {
+            "footer_template": per_lang(str),
+            "random_tips": per_lang(TEXT_LIST),
+            "equivalents": per_lang(TEXT_LIST),
+            "base_carbon": float
+        },
+        "forest_game": {
+            "patrol_events": [{"direction": _text_or_lang, "result": _text_or_lang}]
+        }
+    },
+    "game_settings": {
+        "carbon_achievement": {"interval": int, "messages": per_lang(TEXT_LIST)}
+    }
+}
+
+_TYPE_NAMES = {str: "字符串", int: "整数", float: "数字", bool: "布尔值"}
+
+
+def _check(value, schema, path):
+    """Raise ConfigError unless value matches schema; extra keys are allowed"""
+    where = path or "<root>"
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ConfigError(f"配置项 {where} 应为字典类型")
+        for key, sub in schema.items():
+            child = f"{path}/{key}" if path else key
+            if key not in value:
+                raise ConfigError(f"缺失关键配置项: {child}")
+            _check(value[key], sub, child)
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ConfigError(f"配置项 {where} 应为列表")
+        for i, item in enumerate(value):
+            _check(item, schema[0], f"{path}[{i}]")
+    elif isinstance(schema, MapOf):
+        if not isinstance(value, dict):
+            raise ConfigError(f"配置项 {where} 应为字典类型")
+        for key, item in value.items():
+            _check(item, schema.value, f"{path}/{key}")
+    elif schema is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigError(f"配置项 {where} 应为{_TYPE_NAMES[float]}")
+    elif isinstance(schema, type):
+        if isinstance(value, bool) != (schema is bool) or not isinstance(value, schema):
+            raise ConfigError(f"配置项 {where} 应为{_TYPE_NAMES.get(schema, schema.__name__)}")
+    else:
+        schema(value, path)
+
+
+def deep_merge(base, override):
+    """Merge override into base recursively; lists and scalars are replaced whole"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class _Frozen:
+    """Slotted record whose fields are set once in __init__"""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class LanguageTexts(_Frozen):
+    """Every text table one language needs, ready to use.
+
+    `footer` and `achievements` are precompiled templates: call them with
+    the field values in FOOTER_FIELDS / ACHIEVEMENT_FIELDS order.
+    """
+    __slots__ = ("footer_template", "footer", "tips", "equivalents", "achievement_messages",
+                 "achievements", "patrol_events", "angry_response", "happy_response")
+
+
+class SpecialTrigger(_Frozen):
+    __slots__ = ("name", "conditions", "actions")
+
+
+class CompiledConfig(_Frozen):
+    """Validated, read-only character config; `texts[lang]` holds the per-language tables"""
+    __slots__ = ("base_carbon", "achievement_interval", "angry_triggers",
+                 "special_triggers", "bear_mapping", "texts")
+
+
+FOOTER_FIELDS = ("random_tip", "carbon_offset", "equivalent")
+ACHIEVEMENT_FIELDS = ("count",)
+
+
+def _compile_template(template, fields, path):
+    """Check a str.format template once and turn its named fields into positions.
+
+    Returns the bound format method of the rewritten string, so rendering
+    is a single call with positional arguments (no kwargs dict, no name
+    lookups) and an unknown field is a config error, not a KeyError later.
+    """
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise ConfigError(f"配置项 {path} 模板格式错误: {e}")
+    unknown = {field for _, field, _, _ in parsed if field is not None} - set(fields)
+    if unknown:
+        raise ConfigError(f"配置项 {path} 含未知字段: {', '.join(sorted(unknown))}")
+    out = []
+    for literal, field, spec, conversion in parsed:
+        out.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            out.append("{%d%s%s}" % (fields.index(field),
+                                     "!" + conversion if conversion else "",
+                                     ":" + spec if spec else ""))
+    return "".join(out).format
+
+
+def _non_empty(items, path):
+    if not items:
+        raise ConfigError(f"配置项 {path} 不能为空")
+    return tuple(items)
+
+
+def _patrol_text(value, lang):
+    if isinstance(value, dict):
+        return value.get(lang, value.get('en', ''))
+    return value
+
+
+def compile_config(config):
+    """Validate a merged config dict and freeze it into a CompiledConfig"""
+    _check(config, SCHEMA, "")
+
+    states = config["core_personality"]["default_states"]
+    text = config["interaction_behaviors"]["text_response"]
+    events = config["interaction_behaviors"]["forest_game"]["patrol_events"]
+    achievement = config["game_settings"]["carbon_achievement"]
+
+    if achievement["interval"] <= 0:
+        raise ConfigError("配置项 game_settings/carbon_achievement/interval 应大于0")
+
+    texts = {}
+    for lang in LANGS:
+        footer = text["footer_template"][lang]
+        messages = _non_empty(achievement["messages"][lang], f"carbon_achievement/messages/{lang}")
+        patrol = []
+        for event in events:
+            direction, result = _patrol_text(event["direction"], lang), _patrol_text(event["result"], lang)
+            patrol.append(f"【{direction}】{result}" if lang == 'zh' else f"[{direction}] {result}")
+        texts[lang] = LanguageTexts(
+            footer_template=footer,
+            footer=_compile_template(footer, FOOTER_FIELDS, f"footer_template/{lang}"),
+            tips=_non_empty(text["random_tips"][lang], f"random_tips/{lang}"),
+            equivalents=_non_empty(text["equivalents"][lang], f"equivalents/{lang}"),
+            achievement_messages=messages,
+            achievements=tuple(_compile_template(message, ACHIEVEMENT_FIELDS, f"carbon_achievement/messages/{lang}")
+                               for message in messages),
+            patrol_events=_non_empty(patrol, "forest_game/patrol_events"),
+            angry_response=states["angry_mode"]["response"][lang],
+            happy_response=states["happy_mode"]["response"][lang]
+        )
+
+    return CompiledConfig(
+        base_carbon=float(text["base_carbon"]),
+        achievement_interval=achievement["interval"],
+        angry_triggers=tuple(states["angry_mode"]["trigger"]),
+        special_triggers=tuple(
+            SpecialTrigger(
+                name=special.get("name", ""),
+                conditions=tuple(special["condition"]),
+                actions=tuple(special["actions"]) or ("",)
+            )
+            for special in states["special_triggers"]
+        ),
+        bear_mapping=MappingProxyType(dict(config["language_features"]["熊大式表达"]["mapping"])),
+        texts=MappingProxyType(texts)
+    )
+
+
+def load_config(path=None, strict=False):
+    """Read the character JSON and deep-merge it over DEFAULT_CONFIG.
+
+    A missing or unreadable file falls back to the defaults unless strict
+    (then ConfigError); a file that parses but fails validation is
+    reported by compile_config.
+    """
+    try:
+        with open(path or CONFIG_PATH, 'r', encoding='utf-8') as f:
+            user_config = json.load(f)
+    except Exception as e:
+        if strict:
+            raise ConfigError(f"配置文件读取失败: {e}")
+        print(f"⚠️ Config load failed, using defaults: {str(e)}")
+        return copy.deepcopy(DEFAULT_CONFIG)
+    if not isinstance(user_config, dict):
+        raise ConfigError("配置文件顶层应为字典类型")
+    return deep_merge(copy.deepcopy(DEFAULT_CONFIG), user_config)
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+import time
+
+from metrics import REGISTRY
+
+RELOADS = REGISTRY.counter(
+    "eco_config_reloads_total", "Character config reloads, by result", labels=("result",))
+RELOAD_SECONDS = REGISTRY.histogram(
+    "eco_config_reload_seconds", "Time to read, validate and compile a changed config")
+
+
+class ConfigWatcher:
+    """Polls the character config and hands a freshly built object to on_reload.
+
+    build(path) does all the work (parse, validate, compile matchers and
+    tables) in this background thread, once per change. If it raises, the
+    old version stays live and the failure is counted as a rollback.
+    """
+
+    def __init__(self, path, build, on_reload, interval=2.0):
+        self.path = str(path)
+        self.build = build
+        self.on_reload = on_reload
+        self.interval = interval
+        self.version = 1
+        self.reloads = 0
+        self.rollbacks = 0
+        self.last_reload_ms = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stat, self._digest = self._fingerprint()
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="eco-config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def after_fork(self):
+        """Threads do not survive fork: restart polling in the child if the parent was polling"""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        polling, self._thread = self._thread is not None, None
+        if polling:
+            self.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def _fingerprint(self):
+        try:
+            st = os.stat(self.path)
+            with open(self.path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            return (st.st_mtime_ns, st.st_size), digest
+        except OSError:
+            return None, None
+
+    def check(self):
+        """Reload if the file changed since the last check; returns True on a swap"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+                stat = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stat = None
+            if stat == self._stat:
+                return False
+            stat, digest = self._fingerprint()
+            self._stat = stat
+            # 只是 touch 了一下、内容没变（或这份内容已经试过），就不用重新编译
+            if digest is None or digest == self._digest:
+                return False
+            self._digest = digest
+
+            started = time.perf_counter()
+            try:
+                built = self.build(self.path)
+            except Exception as e:
+                self.rollbacks += 1
+                self.last_error = str(e)
+                RELOADS.inc("rollback")
+                print(f"⚠️ Config reload failed, keeping version {self.version}: {e}")
+                return False
+
+            self.on_reload(built)
+            elapsed = time.perf_counter() - started
+            self.version += 1
+            self.reloads += 1
+            self.last_reload_ms = round(elapsed * 1000, 2)
+            self.last_error = None
+            RELOADS.inc("ok")
+            RELOAD_SECONDS.observe(elapsed)
+            print(f"🌲 Config reloaded in {self.last_reload_ms}ms (version {self.version})")
+            return True
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "reloads": self.reloads,
+            "rollbacks": self.rollbacks,
+            "last_reload_ms": self.last_reload_ms,
+            "last_error": self.last_error,
+            "watching": self._thread is not None
+        }
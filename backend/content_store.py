@@ -0,0 +1,222 @@
+"""Quizzes, stories, menus and tips, kept in SQLite and sampled one row at a time.
+
+Every item sits in a few pools: (kind, lang, "") for all of them, plus
+(kind, lang, "topic:<t>") and (kind, lang, "difficulty:<d>"). Inside a
+pool, items are numbered 0..n-1, so a random pick is one primary-key
+lookup however big the pool is; only the pool sizes live in memory.
+
+Build or refresh the database from JSON / JSONL:
+    python content_store.py import eco_content.json [more.jsonl ...]
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+from math import gcd
+from pathlib import Path
+
+CONTENT_JSON = Path(__file__).parent / "eco_content.json"
+# 每种内容的必填字段（lang 之外；topic、difficulty 可选）
+KINDS = {
+    "quiz": ("question", "options", "answer", "tip"),
+    "story": ("text",),
+    "menu": ("text",),
+    "tip": ("text",),
+}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS items ("
+    " id INTEGER PRIMARY KEY,"
+    " kind TEXT NOT NULL,"
+    " lang TEXT NOT NULL,"
+    " topic TEXT,"
+    " difficulty INTEGER,"
+    " payload TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS pools ("
+    " kind TEXT NOT NULL,"
+    " lang TEXT NOT NULL,"
+    " tag TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " item_id INTEGER NOT NULL,"
+    " PRIMARY KEY (kind, lang, tag, seq)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+def _read_items(path):
+    """Yield (kind, item) from a {kind: [items]} JSON file or a JSONL file with a 'kind' field"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.pop("kind"), item
+        else:
+            for kind, items in json.load(f).items():
+                for item in items:
+                    yield kind, dict(item)
+
+
+class ContentStore:
+    """Read side of the content database; one SQLite connection per thread"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        self._load_sizes()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # 父进程的连接不能在子进程里用
+        self._local = threading.local()
+
+    def _load_sizes(self):
+        rows = self._conn().execute(
+            "SELECT kind, lang, tag, COUNT(*) FROM pools GROUP BY kind, lang, tag"
+        ).fetchall()
+        self.sizes = {(kind, lang, tag): n for kind, lang, tag, n in rows}
+
+    def size(self, kind, lang, tag=""):
+        return self.sizes.get((kind, lang, tag), 0)
+
+    def get(self, kind, lang, seq, tag=""):
+        row = self._conn().execute(
+            "SELECT items.payload FROM pools JOIN items ON items.id = pools.item_id"
+            " WHERE pools.kind = ? AND pools.lang = ? AND pools.tag = ? AND pools.seq = ?",
+            (kind, lang, tag, seq)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def sample(self, kind, lang, cursors=None, tag="", rng=None):
+        """A random item from the pool, or None if it is empty.
+
+        cursors (a session's content_cursors dict) makes the picks a
+        permutation of the pool: no item repeats until all have been seen.
+        rng (a session's SessionRandom) draws the permutation; default: the random module.
+        """
+        rng = rng or random
+        n = self.size(kind, lang, tag)
+        if not n:
+            return None
+        if cursors is None:
+            return self.get(kind, lang, rng.randrange(n), tag)
+
+        # 每个会话一个仿射置换 seq = (a*i + b) mod n，a 与 n 互质；只存四个整数
+        key = f"{kind}:{lang}:{tag}"
+        cursor = cursors.get(key)
+        if cursor is None or cursor[3] != n or cursor[2] >= n:
+            # 池名在每个会话里都一样，驻留后只存一份
+            cursor = cursors[sys.intern(key)] = [self._stride(n, rng), rng.randrange(n), 0, n]
+        a, b, i, _ = cursor
+        cursor[2] = i + 1
+        return self.get(kind, lang, (a * i + b) % n, tag)
+
+    @staticmethod
+    def _stride(n, rng=random):
+        while True:
+            a = rng.randrange(1, n + 1)
+            if gcd(a, n) == 1:
+                return a
+
+    def rebuild(self, sources):
+        """Replace all content with the items in the given JSON / JSONL files"""
+        conn = self._conn()
+        pools = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM pools")
+            conn.execute("DELETE FROM items")
+            for source in sources:
+                for kind, item in _read_items(source):
+                    if kind not in KINDS:
+                        raise ValueError(f"❌ Unknown content kind: {kind}")
+                    missing = [field for field in ("lang",) + KINDS[kind] if field not in item]
+                    if missing:
+                        raise ValueError(f"❌ {source}: {kind} item missing {', '.join(missing)}")
+                    lang = item.pop("lang")
+                    topic = item.pop("topic", None)
+                    difficulty = item.pop("difficulty", None)
+                    item_id = conn.execute(
+                        "INSERT INTO items (kind, lang, topic, difficulty, payload) VALUES (?, ?, ?, ?, ?)",
+                        (kind, lang, topic, difficulty, json.dumps(item, ensure_ascii=False))
+                    ).lastrowid
+                    tags = [""]
+                    if topic:
+                        tags.append(f"topic:{topic}")
+                    if difficulty is not None:
+                        tags.append(f"difficulty:{difficulty}")
+                    for tag in tags:
+                        members = pools.setdefault((kind, lang, tag), [])
+                        members.append(item_id)
+            conn.executemany(
+                "INSERT INTO pools (kind, lang, tag, seq, item_id) VALUES (?, ?, ?, ?, ?)",
+                ((kind, lang, tag, seq, item_id)
+                 for (kind, lang, tag), members in pools.items()
+                 for seq, item_id in enumerate(members))
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('sources', ?)",
+                (json.dumps([str(Path(s).resolve()) for s in sources]),)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)",
+                (str(max(os.stat(s).st_mtime_ns for s in sources)),)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._load_sizes()
+
+    def stale_sources(self):
+        """The source files to rebuild from if any changed since the last build, else None"""
+        meta = dict(self._conn().execute("SELECT key, value FROM meta").fetchall())
+        sources = [Path(s) for s in json.loads(meta.get('sources', '[]'))] or [CONTENT_JSON]
+        sources = [s for s in sources if s.exists()]
+        built_at = int(meta.get('built_at', 0))
+        if sources and any(s.stat().st_mtime_ns > built_at for s in sources):
+            return sources
+        return None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_content_store(path=None):
+    """Shared store for ECO_CONTENT_DB, rebuilt when its source files (default eco_content.json) changed"""
+    path = str(path or os.getenv("ECO_CONTENT_DB") or Path(__file__).parent / "eco_content.db")
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = ContentStore(path)
+            sources = store.stale_sources()
+            if sources:
+                store.rebuild(sources)
+                print(f"🌲 内容库已重建: {path} ({', '.join(s.name for s in sources)})")
+            _stores[path] = store
+        return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "import":
+        print(__doc__)
+        sys.exit(2)
+    store = ContentStore(os.getenv("ECO_CONTENT_DB") or Path(__file__).parent / "eco_content.db")
+    store.rebuild(sys.argv[2:])
+    for (kind, lang, tag), n in sorted(store.sizes.items()):
+        if not tag:
+            print(f"{kind:6} {lang}: {n}")
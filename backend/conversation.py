@@ -0,0 +1,188 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    "eco_context_tokens", "Estimated tokens of conversation context sent with a prompt",
+    buckets=(0, 50, 100, 200, 400, 800, 1600, 3200))
+SUMMARIES = REGISTRY.counter(
+    "eco_summaries_total", "Background summaries of older turns, by result", labels=("result",))
+
+LABELS = {
+    "zh": {"summary": "之前聊过：", "user": "用户：", "bear": "熊大："},
+    "en": {"summary": "Earlier in this chat: ", "user": "User: ", "bear": "Bear: "},
+}
+
+SUMMARY_PROMPT = (
+    "Summarise this conversation between a user and Bear (a forest guardian) in at most "
+    "{words} words. Keep names, facts and open questions; write in the conversation's language.\n\n"
+    "{summary}{turns}"
+)
+
+
+def estimate_tokens(text):
+    """Rough token count: one per CJK character, one per ~4 other characters"""
+    cjk = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _clip(text, tokens):
+    """Cut text down to about `tokens` tokens"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    out, used = [], 0
+    for char in text:
+        used += 4 if '\u4e00' <= char <= '\u9fff' else 1
+        if used > tokens * 4:
+            break
+        out.append(char)
+    return "".join(out) + "…"
+
+
+class ConversationContext:
+    """Read-only snapshot of one session's memory, taken when a prompt is prepared"""
+    __slots__ = ("conversation_id", "summary", "turns", "start", "lang")
+
+    def __init__(self, conversation_id, summary, turns, start, lang):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.turns = turns  # ((user, bear), ...) oldest first
+        self.start = start  # 已移出窗口的轮数：start 和轮数不变，窗口内容就不变
+        self.lang = lang
+
+    def __bool__(self):
+        return bool(self.summary or self.turns)
+
+    def render(self, prompt):
+        """Single-string prompt: summary, recent turns, then the new message"""
+        labels = LABELS[self.lang]
+        lines = []
+        if self.summary:
+            lines.append(labels["summary"] + self.summary)
+        for user, bear in self.turns:
+            lines.append(labels["user"] + user)
+            lines.append(labels["bear"] + bear)
+        lines.append(prompt)
+        return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Rolling per-session history kept under a token budget.
+
+    Turns are sent verbatim until they pass `token_budget`; then a
+    background worker folds the oldest ones (down to half the budget)
+    into a running summary of at most `summary_tokens`, and they leave
+    the window once the summary lands. If summaries fall behind, the
+    window is cut at twice the budget, so the context sent with a prompt
+    stays bounded however long the conversation runs.
+
+    State lives in SessionState.conversation as a plain dict, so it is
+    saved by whichever session backend is in use.
+    """
+
+    def __init__(self, summarise, token_budget=600, summary_tokens=200):
+        self.summarise = summarise  # prompt -> text (a model call)
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="eco-summary")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """New worker thread and lock in a forked child; summaries in flight stay with the parent"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="eco-summary")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def wait(self):
+        """Block until every summary queued so far has landed (one worker: they run in order)"""
+        self._executor.submit(lambda: None).result()
+
+    @property
+    def enabled(self):
+        return self.token_budget > 0
+
+    @staticmethod
+    def _conversation(state):
+        if state.conversation is None:
+            state.conversation = {"id": uuid.uuid4().hex, "summary": "", "turns": [], "start": 0}
+        return state.conversation
+
+    def snapshot(self, state, lang):
+        if not self.enabled:
+            return None
+        conversation = self._conversation(state)
+        context = ConversationContext(
+            conversation["id"],
+            conversation["summary"],
+            tuple((user, bear) for user, bear, _ in conversation["turns"]),
+            conversation["start"],
+            lang
+        )
+        PROMPT_TOKENS.observe(estimate_tokens(context.summary) + sum(t[2] for t in conversation["turns"]))
+        return context
+
+    def record(self, state, user_text, answer):
+        """Append a finished turn; summarise or cut the oldest ones when over budget"""
+        if not self.enabled:
+            return
+        conversation = self._conversation(state)
+        # 单轮太长也要截断，否则窗口里一轮都放不下
+        half = max(self.token_budget // 2, 1)
+        user_text, answer = _clip(user_text, half), _clip(answer, half)
+        turn = [user_text, answer, estimate_tokens(user_text) + estimate_tokens(answer)]  # 记下 token 数，不必每次重算
+
+        # 后台摘要线程也会改 turns，改动都在锁里做
+        with self._lock:
+            turns = conversation["turns"]
+            turns.append(turn)
+            used = sum(t[2] for t in turns)
+            # 摘要跟不上（或一直失败）时直接丢掉最旧的轮次，保证上限
+            while len(turns) > 1 and used > 2 * self.token_budget:
+                used -= turns.pop(0)[2]
+                conversation["start"] += 1
+
+            if used <= self.token_budget or conversation["id"] in self._in_flight:
+                return
+            # 把最旧的几轮折进摘要，直到窗口回到预算的一半
+            fold, remaining = [], used
+            for old in turns[:-1]:
+                if remaining <= half:
+                    break
+                fold.append(old)
+                remaining -= old[2]
+            if not fold:
+                return
+            self._in_flight.add(conversation["id"])
+        self._executor.submit(self._summarise, conversation, conversation["summary"], fold)
+
+    def _summarise(self, conversation, summary, fold):
+        try:
+            turns = "\n".join(f"User: {u}\nBear: {b}" for u, b, _ in fold)
+            prompt = SUMMARY_PROMPT.format(
+                words=self.summary_tokens,
+                summary=f"Summary so far: {summary}\n\n" if summary else "",
+                turns=turns
+            )
+            new_summary = _clip(self.summarise(prompt).strip(), self.summary_tokens)
+            with self._lock:
+                # 只有这段期间摘要没被别人改过才写回（会话可能已从后端重新加载）
+                if conversation["summary"] == summary:
+                    done = {id(turn) for turn in fold}
+                    turns = conversation["turns"]
+                    while turns and id(turns[0]) in done:
+                        turns.pop(0)
+                        conversation["start"] += 1
+                    conversation["summary"] = new_summary
+            SUMMARIES.inc("ok")
+        except Exception as e:
+            SUMMARIES.inc("error")
+            print(f"⚠️ Conversation summary failed (will retry next turn): {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(conversation["id"])
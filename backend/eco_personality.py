@@ -1,185 +1,203 @@
-import json
-import random
-from pathlib import Path
+import copy
 from datetime import datetime
+from types import MappingProxyType
+from session_random import SessionRandom, session_seed
+from session_store import NO_QUIZ, SessionState
+from trigger_matcher import TriggerMatcher
+from bear_rewriter import BearRewriter
+from language_detector import detect_language
+from config_compiler import CONFIG_PATH, compile_config, load_config
+from content_store import get_content_store
 
 class EcoPersonality:
-    def _calculate_carbon_footprint(self, text):
-        """计算文本的碳抵消量"""
-        base = self.config['interaction_behaviors']['text_response']['base_carbon']
-        return round(len(text) * base, 4)
-
-    def __init__(self, config_path=None):
-        """Initialize Bear Guardian's eco-personality system"""
-        self.tree_growth = {}
-        self.config = self._load_config(config_path)
-        self._validate_config()
-        self.interaction_count = 0
-        self.carbon_offset = 0  # Tracks kg of CO2 reduced
-        self._init_emoticons()
-        self.quiz_answers = {
-            'waiting': False,
-            'correct': None,
-            'tip': None
-        }
-        self.current_lang = 'en'  # Default language
-
-    def _init_emoticons(self):
-        """Bear's special emoticon library"""
-        self.emoticons = {
-            'positive': ['(｡♥‿♥｡)', '🐻👍', '🌳♡'],
-            'negative': ['(╬ಠ益ಠ)', '🐻💢', '🪓❌'],
-            'alert': ['🚨🐻', '🔥⚠️', '🌲🆘'],
-            'nature': ['🐝', '🍯', '🐿️'],
-            'bear': ['ʕ·͡ᴥ·ʔ', 'ʕ￫ᴥ￩ʔ', 'ᕙ(▀̿̿Ĺ̯̿̿▀̿ ̿)ᕗ']
+    # 特殊指令 -> 处理方法名（同时命中多个时，靠前的优先）
+    COMMANDS = {
+        "zh": {
+            "熊大讲故事": "_generate_forest_story",
+            "巡逻森林": "_forest_patrol",
+            "熊大考考你": "_generate_quiz",
+            "熊大饿了": "_bear_kitchen",
+            "我的森林": "_show_forest"
+        },
+        "en": {
+            "Bear story": "_generate_forest_story",
+            "Patrol forest": "_forest_patrol",
+            "Bear quiz": "_generate_quiz",
+            "Bear hungry": "_bear_kitchen",
+            "My forest": "_show_forest"
         }
+    }
 
-    def _load_config(self, path):
-        """Load config file with Bear's default settings"""
-        default_config = {
-            "core_personality": {
-                "base": "Forest Guardian Bear",
-                "default_states": {
-                    "happy_mode": {
-                        "response": {
-                            "zh": "保护森林，熊熊有责！俺们一起行动 (•̀ᴗ•́)و",
-                            "en": "Protecting forests is my duty! Let's work together (•̀ᴗ•́)و"
-                        },
-                        "emoticon": ["🌲", "🐻", "💪"]
-                    },
-                    "angry_mode": {
-                        "trigger": ["砍树", "偷猎", "污染", "光头强", "logging", "poaching", "pollution"],
-                        "response": {
-                            "zh": "住手！破坏森林可不行！(╬ Ò﹏Ó)",
-                            "en": "Stop! No destroying forests! (╬ Ò﹏Ó)"
-                        },
-                        "visual_effect": "🐻🔥"
-                    }
-                }
-            },
-            "interaction_behaviors": {
-                "text_response": {
-                    "footer_template": {
-                        "zh": "🐻 记住: {random_tip} | 减少碳排放: {carbon_offset}kg (相当于{equivalent})",
-                        "en": "🐻 Tip: {random_tip} | CO₂ reduced: {carbon_offset}kg (Like {equivalent})"
-                    },
-                    "random_tips": {
-                        "zh": [
-                            "晚上关灯省电，猫头鹰睡觉不被打扰 🦉",
-                            "节约用纸就是少砍树🌲"
-                        ],
-                        "en": [
-                            "Turn off lights at night to save energy! 🦉",
-                            "Walking instead of driving saves 0.2kg CO2 per km 🚶"
-                        ]
-                    },
-                    "equivalents": {
-                        "zh": ["充电10部手机 📱", "少洗1次热水澡 🚿"],
-                        "en": ["charging 10 phones 📱", "1 less hot shower 🚿"]
-                    },
-                    "base_carbon": 0.0007
-                },
-                "forest_game": {
-                    "patrol_events": [
-                        {
-                            "direction": {"zh": "左", "en": "left"},
-                            "result": {
-                                "zh": "发现光头强在偷蜂蜜！用蜂巢赶跑他！(╯‵□′)╯🐝",
-                                "en": "Caught Logger stealing honey! Used beehive to chase him! (╯‵□′)╯🐝"
-                            }
-                        },
-                        {
-                            "direction": {"zh": "右", "en": "right"}, 
-                            "result": {
-                                "zh": "帮小松鼠种下橡果，明年会长出新大树！🌰➡️🌳",
-                                "en": "Helped squirrel plant an acorn! New tree coming soon! 🌰➡️🌳"
-                            }
-                        }
-                    ]
-                }
-            },
-            "game_settings": {
-                "carbon_achievement": {
-                    "interval": 5,
-                    "messages": {
-                        "zh": [
-                            "🎉 你减少了{count}kg碳排放！继续努力~",
-                            "🌍 减少{count}kg碳足迹！地球感谢你！"
-                        ],
-                        "en": [
-                            "🎉 You've reduced {count}kg CO₂! Keep it up!",
-                            "🌍 {count}kg less carbon footprint! Earth thanks you!"
-                        ]
-                    }
-                }
-            }
+    # 熊大式说法（eco_ai_character.json 的 language_features 可以补充/覆盖）
+    BEAR_WORDS = {
+        "zh": {
+            "你们": "俺们",
+            "你": "俺",
+            "环保": "保护林子",
+            "生态": "森林大家庭",
+            "应该": "得",
+            "知道": "晓得",
+            "可以": "能行"
+        },
+        "en": {
+            "we": "bears",
+            "I": "bear",
+            "environment": "our forest home",
+            "eco": "tree-hugging",
+            "should": "gotta",
+            "know": "know darn well",
+            "people": "two-leggers"
         }
+    }
+
+    # Bear's special emoticon library（只读，所有人格和会话共用一份）
+    EMOTICONS = MappingProxyType({
+        'positive': ('(｡♥‿♥｡)', '🐻👍', '🌳♡'),
+        'negative': ('(╬ಠ益ಠ)', '🐻💢', '🪓❌'),
+        'alert': ('🚨🐻', '🔥⚠️', '🌲🆘'),
+        'nature': ('🐝', '🍯', '🐿️'),
+        'bear': ('ʕ·͡ᴥ·ʔ', 'ʕ￫ᴥ￩ʔ', 'ᕙ(▀̿̿Ĺ̯̿̿▀̿ ̿)ᕗ')
+    })
+    _OTHER_EMOTICONS = ('',) + EMOTICONS['bear']
+    BEAR_ENDINGS = MappingProxyType({
+        "zh": ("，晓得吧？", "，俺跟你说！", "，熊不骗你！"),
+        "en": (", ya know?", ", I tell ya!", ", bear's honor!")
+    })
+
+    def _calculate_carbon_footprint(self, text):
+        """计算文本的碳抵消量"""
+        return round(len(text) * self.settings.base_carbon, 4)
+
+    def __init__(self, config_path=None, strict=False, content=None, ledger=None):
+        """Initialize Bear Guardian's eco-personality system (strict: a bad config file raises).
+
+        Everything here is shared and read-only once built; what belongs to
+        one user is in self.state (a SessionState), see for_session.
+        """
+        self.content = content or get_content_store()  # 题库、故事、菜单、小贴士
+        self.ledger = ledger  # ImpactLedger：减排量和答题成绩持久化（None 时只存在会话里）
+        self.config_path = config_path or CONFIG_PATH
+        self.config = self._load_config(self.config_path, strict)
+        self.settings = compile_config(self.config)  # 校验并冻结，热路径只做属性查找
+        self.matcher = self._compile_matcher()
+        self.rewriters = self._compile_rewriters()
+        self.state = SessionState()  # carbon_offset (kg CO2), quiz, language...
+        self.emoticons = self.EMOTICONS
+
+    def for_session(self, state):
+        """Return a view of this personality bound to one user's state (a shallow copy: tables are shared)"""
+        persona = copy.copy(self)
+        persona.state = state
+        return persona
+
+    # 用户状态都存放在 self.state 中，以便按会话保存
+    @property
+    def interaction_count(self):
+        return self.state.interaction_count
+
+    @interaction_count.setter
+    def interaction_count(self, value):
+        self.state.interaction_count = value
+
+    @property
+    def carbon_offset(self):
+        if self.ledger is not None:
+            # 加上本次请求里还没写进账本的减排量
+            pending = sum(amount for _, _, kind, amount in self.state.ledger_events or ()
+                          if kind != 'footprint')
+            return round(self.ledger.totals(self._user_id()).carbon_offset + pending, 4)
+        return self.state.carbon_offset
+
+    @carbon_offset.setter
+    def carbon_offset(self, value):
+        self.state.carbon_offset = value
+
+    @property
+    def quiz_answers(self):
+        return self.state.quiz_answers
+
+    @quiz_answers.setter
+    def quiz_answers(self, value):
+        self.state.quiz_answers = value
 
-        try:
-            config_path = path or Path(__file__).parent/"eco_ai_character.json"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                user_config = json.load(f)
-            return {**default_config, **user_config}
-        except Exception as e:
-            print(f"⚠️ Config load failed, using defaults: {str(e)}")
-            return default_config
+    @property
+    def current_lang(self):
+        return self.state.current_lang
+
+    @current_lang.setter
+    def current_lang(self, value):
+        self.state.current_lang = value
+
+    @property
+    def rng(self):
+        """The session's random source, created on first use (seeded from ECO_RANDOM_SEED if set)"""
+        rng = self.state.rng
+        if rng is None:
+            rng = self.state.rng = SessionRandom(session_seed(self.state.session_id))
+        return rng
+
+    def _user_id(self):
+        return self.state.session_id or "local"
+
+    def _credit(self, kind, co2_kg):
+        """Add to the user's carbon offset and log the event in the impact ledger"""
+        self.state.carbon_offset += co2_kg
+        self._record(kind, co2_kg)
+
+    def _record(self, kind, amount=0.0):
+        if self.ledger is None:
+            return
+        if self.state.ledger_events is not None:
+            # 存储管理的会话：等会话保存成功再记账（SessionStore.put）
+            self.state.ledger_events.append((self.ledger, self._user_id(), kind, amount))
+        else:
+            self.ledger.record(self._user_id(), kind, amount)
+
+    def _load_config(self, path, strict=False):
+        """Load config file deep-merged over Bear's default settings"""
+        return load_config(path, strict)
 
     def _add_emoticon(self, text, emotion_type):
         """Add Bear-style emoticons"""
-        if random.random() < 0.8:
-            return f"{text} {random.choice(self.emoticons.get(emotion_type, ['']+self.emoticons['bear']))}"
+        rng = self.rng
+        if rng.chance(0.8):
+            return f"{text} {rng.choice(self.emoticons.get(emotion_type, self._OTHER_EMOTICONS))}"
         return text
 
     def _get_equivalent(self, co2_kg):
         """Get relatable CO2 equivalent"""
-        equivalents = self.config['interaction_behaviors']['text_response']['equivalents'][self.current_lang]
+        equivalents = self.settings.texts[self.current_lang].equivalents
         index = min(int(co2_kg/0.5), len(equivalents)-1)
         return equivalents[index]
 
     def _detect_language(self, text):
-        """Detect if text is Chinese or English"""
-        chinese_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
-        return 'zh' if chinese_chars > len(text)/2 else 'en'
+        """Detect if text is Chinese or English (mixed text keeps the session's language)"""
+        return detect_language(text, self.current_lang)
 
-    def _apply_bear_language(self, text):
-        """Convert text to Bear's unique speaking style"""
-        replacements = {
-            "zh": {
-                "你们": "俺们",
-                "你": "俺", 
-                "环保": "保护林子",
-                "生态": "森林大家庭",
-                "应该": "得",
-                "知道": "晓得",
-                "可以": "能行"
-            },
-            "en": {
-                "we": "bears",
-                "I": "bear",
-                "environment": "our forest home",
-                "eco": "tree-hugging",
-                "should": "gotta",
-                "know": "know darn well",
-                "people": "two-leggers"
-            }
+    def _compile_rewriters(self):
+        """One single-pass rewriter per language (config mapping overrides built-ins)"""
+        return {
+            "zh": BearRewriter({**self.BEAR_WORDS["zh"], **self.settings.bear_mapping}),
+            "en": BearRewriter(self.BEAR_WORDS["en"])
         }
-        
-        # Get replacements for current language
-        lang_replacements = replacements.get(self.current_lang, {})
-        
-        # Apply each replacement
-        for standard, bear_version in lang_replacements.items():
-            text = text.replace(standard, bear_version)
-        
+
+    def _replace_bear_words(self, text):
+        return self.rewriters[self.current_lang].rewrite(text)
+
+    def _bear_ending(self):
         # Add bear-like sentence endings randomly
-        if random.random() < 0.3:  # 30% chance to add bear-like ending
-            endings = {
-                "zh": ["，晓得吧？", "，俺跟你说！", "，熊不骗你！"],
-                "en": [", ya know?", ", I tell ya!", ", bear's honor!"]
-            }
-            text += random.choice(endings.get(self.current_lang, [""]))
-        
-        return text
+        rng = self.rng
+        if rng.chance(0.3):  # 30% chance to add bear-like ending
+            return rng.choice(self.BEAR_ENDINGS.get(self.current_lang, ("",)))
+        return ""
+
+    def _apply_bear_language(self, text):
+        """Convert text to Bear's unique speaking style"""
+        return self._replace_bear_words(text) + self._bear_ending()
+
+    def bear_language_stream(self):
+        """Incremental _apply_bear_language for text that arrives in chunks"""
+        return BearLanguageStream(self)
 
     def process_input(self, user_input):
         """Process user input with language detection"""
@@ -187,41 +205,74 @@ class EcoPersonality:
         self.interaction_count += 1
 
         # Check if in quiz session
-        if user_input.upper() in ['A', 'B', 'C'] and self.quiz_answers.get('waiting'):
+        if self.is_quiz_answer(user_input):
             return self._check_quiz_answer(user_input)
 
+        # One pass finds every command, angry trigger and special trigger
+        matches = self.matcher.find_all(user_input)
+
         # Special command handlers
-        commands = {
-            "zh": {
-                "熊大讲故事": self._generate_forest_story,
-                "巡逻森林": self._forest_patrol,
-                "熊大考考你": self._generate_quiz,
-                "熊大饿了": self._bear_kitchen,
-                "我的森林": self._show_forest  
-            },
-            "en": {
-                "Bear story": self._generate_forest_story,
-                "Patrol forest": self._forest_patrol,
-                "Bear quiz": self._generate_quiz,
-                "Bear hungry": self._bear_kitchen,
-                "My forest": self._show_forest 
-            }
-        }
-        
-        for cmd, handler in commands[self.current_lang].items():
-            if cmd in user_input:
-                return {"processed": handler()}
+        command = self.find_command(user_input, matches)
+        if command:
+            cmd, handler = command
+            return {"processed": getattr(self, handler)(), "command": cmd, "handler": handler.lstrip('_')}
 
         # Ecological alert trigger
-        text = self._trigger_ecological_alert(user_input)
+        alert_text, emotion = self._ecological_alert(user_input, matches)
+        text = self._add_emoticon(alert_text, emotion)
         # Language style conversion
         text = self._apply_bear_language(text)
-        return {"processed": text, "original": user_input}
+        result = {
+            "processed": text,
+            "original": user_input,
+            # 不带随机表情和结尾的版本，用作回答缓存的键
+            "prompt_key": self._replace_bear_words(alert_text)
+        }
+
+        # Special triggers (e.g. 森林课堂模式) add a knowledge card to the answer
+        specials = [p[1] for _, _, p in matches if p[0] == 'special']
+        if specials:
+            result["special"] = self._special_action(specials[0])
+        return result
+
+    def is_quiz_answer(self, user_input):
+        return user_input.upper() in ['A', 'B', 'C'] and bool(self.quiz_answers.get('waiting'))
+
+    def find_command(self, user_input, matches=None):
+        """(command text, handler method name) of the command in the message, or None.
+
+        Either language's command works (e.g. "Bear quiz 熊大") and the
+        reply stays in the session language; ties go to that language's
+        commands, then to the earlier entry in COMMANDS.
+        """
+        if matches is None:
+            matches = self.matcher.find_all(user_input)
+        commands = [p for _, _, p in matches if p[0] == 'command']
+        if not commands:
+            return None
+        _, lang, _, cmd = min(commands, key=lambda p: (p[1] != self.current_lang, p[2]))
+        return cmd, self.COMMANDS[lang][cmd]
+
+    def _compile_matcher(self):
+        """Compile commands, angry triggers and special triggers into one automaton"""
+        entries = []
+        for lang, commands in self.COMMANDS.items():
+            for priority, cmd in enumerate(commands):
+                entries.append((cmd, ('command', lang, priority, cmd)))
+        for trigger in self.settings.angry_triggers:
+            entries.append((trigger, ('angry',)))
+        for index, special in enumerate(self.settings.special_triggers):
+            for condition in special.conditions:
+                entries.append((condition, ('special', index)))
+        return TriggerMatcher(entries)
+
+    def _special_action(self, index):
+        return self.rng.choice(self.settings.special_triggers[index].actions)
 
     def _show_forest(self):
         """显示森林状态"""
-        trees = int(self.carbon_offset)  # 树木数量取整数部分
-        co2 = self.carbon_offset
+        co2 = self.carbon_offset  # 账本里的汇总值，读一次
+        trees = int(co2)  # 树木数量取整数部分
         
         tree_art = {
             1: "🌱",   # 树苗
@@ -238,124 +289,38 @@ class EcoPersonality:
 
     def _trigger_ecological_alert(self, text):
         """触发生态警报（熊大愤怒模式）"""
-        try:
-            # 安全获取配置结构
-            angry_config = (
-                self.config
-                .get('core_personality', {})
-                .get('default_states', {})
-                .get('angry_mode', {})
-            )
-
-            # 提取触发词和响应
-            triggers = angry_config.get('trigger', [])
-            response_map = angry_config.get('response', {})
-            
-            # 类型验证
-            if not isinstance(response_map, dict):
-                raise TypeError("愤怒模式响应配置应为字典格式")
-                
-            # 获取当前语言响应
-            lang = self.current_lang
-            default_response = {
-                "zh": "森林需要保护！(｀⌒´メ)",
-                "en": "Protect the forest! (｀⌒´メ)"
-            }
-            response = response_map.get(lang, default_response[lang])
-
-            # 检查触发词
-            for trigger in triggers:
-                if isinstance(trigger, str) and trigger.lower() in text.lower():
-                    return self._add_emoticon(response, 'alert')
-            
-            return self._add_emoticon(text, 'nature')
-
-        except Exception as e:
-            print(f"[DEBUG] Ecological alert error: {str(e)}")
-            print(f"[DEBUG] Current config: {json.dumps(angry_config, indent=2)}")
-            return self._add_emoticon(text, 'nature')
-
-    def _validate_config(self):
-        """验证关键配置结构"""
-        required_paths = [
-            'core_personality/default_states/angry_mode/response',
-            'core_personality/default_states/happy_mode/response'
-        ]
-        
-        for path in required_paths:
-            keys = path.split('/')
-            current = self.config
-            for key in keys:
-                if key not in current:
-                    raise KeyError(f"缺失关键配置项: {path}")
-                current = current[key]
-            if not isinstance(current, dict):
-                raise TypeError(f"配置项 {path} 应为字典类型")
-        
+        return self._add_emoticon(*self._ecological_alert(text))
+
+    def _ecological_alert(self, text, matches=None):
+        """Return (text, emoticon type): the angry response if a trigger matched"""
+        # 检查触发词（由自动机一次扫描得出）
+        if matches is None:
+            matches = self.matcher.find_all(text)
+        if any(payload[0] == 'angry' for _, _, payload in matches):
+            return self.settings.texts[self.current_lang].angry_response, 'alert'
+        return text, 'nature'
+
     def _generate_forest_story(self):
         """Generate forest story"""
-        stories = {
-            "zh": [
-                "昨天追光头强时，发现他扔的塑料瓶卡住小鹿的腿了(；′⌒`) 以后垃圾要分类！♻️",
-                "蜜蜂兄弟说：'熊大，农药让俺们找不到花蜜！' 🐝...现在俺只用天然驱虫法！🌿"
-            ],
-            "en": [
-                "Found a deer with its leg stuck in a plastic bottle Logger left (；′⌒`) Always recycle! ♻️",
-                "Bees told me: 'Bear, pesticides ruin our honey!' 🐝...now I only use natural pest control! 🌿"
-            ]
-        }
-        return self._add_emoticon(f"📖 {random.choice(stories[self.current_lang])}", 'positive')
+        story = self._sample_content('story')
+        if story is None:
+            return self.settings.texts[self.current_lang].happy_response
+        return self._add_emoticon(f"📖 {story['text']}", 'positive')
+
+    def _sample_content(self, kind, tag=""):
+        """Next item of this kind for the session (no repeats until the pool is used up)"""
+        return self.content.sample(kind, self.current_lang, self.state.content_cursors, tag, self.rng)
 
     def _forest_patrol(self):
-        events = self.config['interaction_behaviors']['forest_game']['patrol_events']
-        event = random.choice(events)
-        direction = event['direction']
-        result = event['result']
-
-        if isinstance(direction, dict):
-            direction = direction.get(self.current_lang, direction.get('en', ''))
-        if isinstance(result, dict):
-            result = result.get(self.current_lang, result.get('en', ''))
-
-        return self._add_emoticon(
-            f"【{direction}】{result}" if self.current_lang == 'zh' else f"[{direction}] {result}",
-            'positive'
-        )
+        # 方向和结果已按语言预先拼好
+        event = self.rng.choice(self.settings.texts[self.current_lang].patrol_events)
+        return self._add_emoticon(event, 'positive')
 
     def _generate_quiz(self):
         """Generate ecology quiz"""
-        quizzes = {
-            "zh": [
-                {
-                    "question": "森林里枯木应该清理吗？",
-                    "options": ["A. 必须清理", "B. 适当保留", "C. 全烧掉"],
-                    "answer": "B",
-                    "tip": "🐻 枯木是昆虫的家，适当保留更生态！"
-                },
-                {
-                    "question": "哪种行为最伤害森林？",
-                    "options": ["A. 捡蘑菇", "B. 挖野生兰花", "C. 拍鸟巢照片"],
-                    "answer": "B",
-                    "tip": "🐻💢 破坏原生植物会让小动物饿肚子！"
-                }
-            ],
-            "en": [
-                {
-                    "question": "Should dead wood be cleared from forests?",
-                    "options": ["A. Clear completely", "B. Leave some", "C. Burn it all"],
-                    "answer": "B",
-                    "tip": "🐻 Dead wood is home to insects! Leave some for ecosystem!"
-                },
-                {
-                    "question": "Which action harms forests most?",
-                    "options": ["A. Picking mushrooms", "B. Digging wild orchids", "C. Taking nest photos"],
-                    "answer": "B",
-                    "tip": "🐻💢 Removing native plants starves animals!"
-                }
-            ]
-        }
-        
-        quiz = random.choice(quizzes[self.current_lang])
+        quiz = self._sample_content('quiz')
+        if quiz is None:
+            return self.settings.texts[self.current_lang].happy_response
         self.quiz_answers = {
             'waiting': True,
             'correct': quiz['answer'],
@@ -371,53 +336,86 @@ class EcoPersonality:
         
         if is_correct:
             # 每次答对增加树木和减排量
-            self.carbon_offset += 1.0  # 1棵树=1kg CO2
+            self._credit('quiz_correct', 1.0)  # 1棵树=1kg CO2
             plant_msg = {
                 "zh": "🌱 通过知识守护了1棵树！",
                 "en": "🌱 Protected 1 tree with knowledge!"
             }[self.current_lang]
             result = f"{plant_msg} {self.quiz_answers['tip']}"
         else:
+            self._record('quiz_wrong')
             result = {
                 "zh": "错啦！",
                 "en": "Wrong! "
             }[self.current_lang] + self.quiz_answers['tip']
         
-        self.quiz_answers = {}
-        return {"processed": self._add_emoticon(result, 'positive')}
+        self.quiz_answers = NO_QUIZ
+        return {"processed": self._add_emoticon(result, 'positive'), "quiz": "correct" if is_correct else "wrong"}
 
     def _bear_kitchen(self):
         """Bear's kitchen tips"""
-        menus = {
-            "zh": [
-                "🐝 今天吃野莓蜂蜜沙拉！选本地蜂农的蜜，帮蜜蜂保家园~",
-                "🌽 来根玉米吧！比牛肉少用90%水呢！(๑•̀ㅂ•́)و✧"
-            ],
-            "en": [
-                "🐝 Try wild berry honey salad! Local honey helps bees!",
-                "🌽 Have some corn! Uses 90% less water than beef! (๑•̀ㅂ•́)و✧"
-            ]
-        }
-        return self._add_emoticon(random.choice(menus[self.current_lang]), 'nature')
+        menu = self._sample_content('menu')
+        if menu is None:
+            return self.settings.texts[self.current_lang].happy_response
+        return self._add_emoticon(menu['text'], 'nature')
 
     def format_response(self, ai_text):
-        """Format response with carbon tracking"""
-        # Update achievement
+        """Format response with carbon tracking.
+
+        Returns the display text, its parts and meta: the reply's carbon
+        footprint is worked out here once, so callers don't measure it again.
+        """
+        texts = self.settings.texts[self.current_lang]
         achievement = None
-        if self.interaction_count % self.config['game_settings']['carbon_achievement']['interval'] == 0:
-            self.carbon_offset += 0.5
-            msg = random.choice(self.config['game_settings']['carbon_achievement']['messages'][self.current_lang])
-            achievement = msg.format(count=self.carbon_offset)
-
-        # Build footer
-        footer_template = self.config['interaction_behaviors']['text_response']['footer_template'][self.current_lang]
-        footer = footer_template.format(
-            random_tip=random.choice(self.config['interaction_behaviors']['text_response']['random_tips'][self.current_lang]),
-            carbon_offset=self.carbon_offset,
-            equivalent=self._get_equivalent(self.carbon_offset)
+        if self.interaction_count % self.settings.achievement_interval == 0:
+            self._credit('achievement', 0.5)
+            achievement = self.rng.choice(texts.achievements)
+        carbon_offset = self.carbon_offset  # 有账本时是一次查询，只读一次
+
+        # 模板在配置编译时已转成位置参数，这里只做一次 format
+        tip = self._sample_content('tip')  # 内容库没有小贴士时用角色配置里的
+        equivalents = texts.equivalents
+        footer = texts.footer(
+            tip['text'] if tip else self.rng.choice(texts.tips),
+            carbon_offset,
+            equivalents[min(int(carbon_offset / 0.5), len(equivalents) - 1)]
         )
 
-        response = f"{ai_text}\n\n{footer}"
         if achievement:
-            response += f"\n{achievement}"
-        return {'display': response}
\ No newline at end of file
+            achievement = achievement(carbon_offset)
+            response = "".join((ai_text, "\n\n", footer, "\n", achievement))
+        else:
+            response = "".join((ai_text, "\n\n", footer))
+        footprint = self._calculate_carbon_footprint(response)
+        self._record('footprint', footprint)
+        return {'display': response, 'footer': footer, 'achievement': achievement,
+                'meta': {'carbon_offset': footprint}}
+
+
+class BearLanguageStream:
+    """Feeds model chunks through Bear's rewriter without splitting a phrase.
+
+    The tail of the buffer that the next chunk could still change is held
+    back until more text (or flush) decides it.
+    """
+
+    def __init__(self, persona):
+        self.persona = persona
+        self.rewriter = persona.rewriters[persona.current_lang]
+        self.buffer = ""
+        self.context = 0  # 缓冲区开头保留的已输出字符（供整词判断）
+
+    def feed(self, chunk):
+        """Add a chunk; return the rewritten text that is now safe to send"""
+        self.buffer += chunk
+        return self._emit(final=False)
+
+    def flush(self):
+        """Rewrite whatever is left and add the random Bear ending"""
+        return self._emit(final=True) + self.persona._bear_ending()
+
+    def _emit(self, final):
+        text, cut = self.rewriter.rewrite_ready(self.buffer, self.context, final)
+        self.context = min(cut, 1)
+        self.buffer = self.buffer[cut - self.context:]
+        return text
@@ -0,0 +1,71 @@
+"""gunicorn settings for the Bear API:  cd backend && gunicorn wsgi:app
+
+The app is imported once in the master (preload_app), so the compiled
+character config, trigger matchers, Bear rewriters and content-pool sizes
+are built once and shared copy-on-write by every worker. The garbage
+collector is kept off while they load and then frozen, so collections in
+the workers never touch (and copy) those pages.
+
+Threads and SQLite connections do not survive fork; post_fork gives each
+worker its own. On SIGTERM a worker first reports not-ready at
+/api/ready for ECO_DRAIN_SECONDS, then finishes its in-flight requests
+and flushes the impact ledger.
+"""
+import gc
+import multiprocessing
+import os
+import signal
+import threading
+
+# 多个进程必须共用会话后端，否则同一用户的下一条消息落到别的进程就丢了状态
+os.environ.setdefault("ECO_SESSION_BACKEND", "sqlite")
+
+bind = os.getenv("ECO_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("ECO_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("ECO_THREADS", "8"))  # 模型调用是阻塞 IO，一个进程多开几个线程
+preload_app = True
+timeout = 60
+graceful_timeout = int(os.getenv("ECO_GRACEFUL_TIMEOUT", "30"))
+# 处理这么多请求后换一个新进程，慢慢涨上去的内存（碎片、缓存）随之释放
+max_requests = int(os.getenv("ECO_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10  # 错开，免得所有进程同时重启
+keepalive = 5
+accesslog = os.getenv("ECO_ACCESS_LOG") or None
+
+DRAIN_SECONDS = float(os.getenv("ECO_DRAIN_SECONDS", "0"))
+
+# 载入期间不做 GC；when_ready 里冻结后再打开
+gc.disable()
+
+
+def when_ready(server):
+    # preload 已完成、还没 fork：把现有对象移到永久代，之后的 GC 不再扫描它们
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.after_fork()
+
+
+def post_worker_init(worker):
+    import wsgi
+    handle_exit = worker.handle_exit
+
+    def drain_then_exit(sig, frame):
+        wsgi.drain()
+        if DRAIN_SECONDS > 0:
+            # 先报告未就绪，过一会儿再停止接收新连接
+            threading.Timer(DRAIN_SECONDS, handle_exit, (sig, frame)).start()
+        else:
+            handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, drain_then_exit)
+
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.shutdown()
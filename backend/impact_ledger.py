@@ -0,0 +1,246 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from metrics import REGISTRY
+
+FLUSHES = REGISTRY.histogram(
+    "eco_ledger_flush_seconds", "Time to group-commit one batch of impact events")
+EVENTS = REGISTRY.counter(
+    "eco_ledger_events_total", "Impact events recorded, by kind", labels=("kind",))
+
+# 事件种类 -> 计入哪个汇总字段
+KINDS = {
+    "quiz_correct": "quiz_correct",
+    "quiz_wrong": "quiz_wrong",
+    "achievement": "achievements",
+    "footprint": "responses",
+}
+
+
+class ImpactTotals:
+    """One user's running totals, as stored in the `totals` table"""
+    __slots__ = ("carbon_offset", "footprint", "quiz_correct", "quiz_wrong", "achievements", "responses")
+
+    def __init__(self, carbon_offset=0.0, footprint=0.0, quiz_correct=0, quiz_wrong=0,
+                 achievements=0, responses=0):
+        self.carbon_offset = carbon_offset
+        self.footprint = footprint
+        self.quiz_correct = quiz_correct
+        self.quiz_wrong = quiz_wrong
+        self.achievements = achievements
+        self.responses = responses
+
+    def add(self, kind, amount):
+        setattr(self, KINDS[kind], getattr(self, KINDS[kind]) + 1)
+        if kind == "footprint":
+            self.footprint += amount
+        else:
+            self.carbon_offset += amount
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class ImpactLedger:
+    """Append-only log of impact events with incrementally maintained per-user totals.
+
+    record() only appends to an in-memory queue; a writer thread commits
+    everything queued in one WAL transaction every `flush_interval`
+    seconds (or sooner once `max_batch` events are waiting), inserting the
+    events and upserting each touched user's totals. Reads are one
+    primary-key lookup plus any of this process's events not yet flushed.
+    """
+
+    def __init__(self, path, flush_interval=0.05, max_batch=1000):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._local = threading.local()
+        self._queue = []
+        self._pending = {}  # user_id -> ImpactTotals of queued, unflushed events
+        self._flushing = {}  # 正在提交的那一批，提交完成前读取也要算上
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " amount REAL NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS totals ("
+            " user_id TEXT PRIMARY KEY,"
+            " carbon_offset REAL NOT NULL DEFAULT 0,"
+            " footprint REAL NOT NULL DEFAULT 0,"
+            " quiz_correct INTEGER NOT NULL DEFAULT 0,"
+            " quiz_wrong INTEGER NOT NULL DEFAULT 0,"
+            " achievements INTEGER NOT NULL DEFAULT 0,"
+            " responses INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL)"
+        )
+        # 排行榜按这个索引倒序走前 N 条，与事件总数无关
+        conn.execute("CREATE INDEX IF NOT EXISTS totals_rank ON totals(carbon_offset DESC)")
+        self._start_writer()
+        atexit.register(self.close)
+
+    def _start_writer(self):
+        self._writer = threading.Thread(target=self._run, name="eco-ledger-writer", daemon=True)
+        self._writer.start()
+
+    def after_fork(self):
+        """In a forked worker: own connection, locks and writer thread.
+
+        Events queued before the fork belong to the parent, which flushes them.
+        """
+        self._local = threading.local()
+        self._queue, self._pending, self._flushing = [], {}, {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._start_writer()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, user_id, kind, amount=0.0):
+        if kind not in KINDS:
+            raise ValueError(f"❌ Unknown impact event: {kind}")
+        with self._lock:
+            self._queue.append((user_id, kind, float(amount), time.time()))
+            pending = self._pending.get(user_id)
+            if pending is None:
+                pending = self._pending[user_id] = ImpactTotals()
+            pending.add(kind, amount)
+            full = len(self._queue) >= self.max_batch
+        EVENTS.inc(kind)
+        if full:
+            self._wake.set()
+
+    def totals(self, user_id):
+        """Flushed totals plus this process's queued events"""
+        with self._flush_lock:
+            row = self._conn().execute(
+                "SELECT carbon_offset, footprint, quiz_correct, quiz_wrong, achievements, responses"
+                " FROM totals WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            with self._lock:
+                unflushed = [d[user_id] for d in (self._flushing, self._pending) if user_id in d]
+        totals = ImpactTotals(*row) if row else ImpactTotals()
+        for delta in unflushed:
+            for slot in ImpactTotals.__slots__:
+                setattr(totals, slot, getattr(totals, slot) + getattr(delta, slot))
+        totals.carbon_offset = round(totals.carbon_offset, 4)
+        totals.footprint = round(totals.footprint, 4)
+        return totals
+
+    def leaderboard(self, limit=10):
+        rows = self._conn().execute(
+            "SELECT user_id, carbon_offset, quiz_correct FROM totals"
+            " ORDER BY carbon_offset DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {"rank": i + 1, "player": public_name(user_id), "carbon_offset": round(carbon, 4),
+             "quiz_correct": quiz_correct}
+            for i, (user_id, carbon, quiz_correct) in enumerate(rows)
+        ]
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️ Impact ledger flush failed, will retry: {e}")
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Group-commit every queued event; returns how many were written"""
+        with self._lock:
+            batch, self._queue = self._queue, []
+            deltas, self._pending = self._pending, {}
+            self._flushing = deltas
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO events (user_id, kind, amount, created_at) VALUES (?, ?, ?, ?)", batch)
+            conn.executemany(
+                "INSERT INTO totals (user_id, carbon_offset, footprint, quiz_correct, quiz_wrong,"
+                " achievements, responses, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " carbon_offset = carbon_offset + excluded.carbon_offset,"
+                " footprint = footprint + excluded.footprint,"
+                " quiz_correct = quiz_correct + excluded.quiz_correct,"
+                " quiz_wrong = quiz_wrong + excluded.quiz_wrong,"
+                " achievements = achievements + excluded.achievements,"
+                " responses = responses + excluded.responses,"
+                " updated_at = excluded.updated_at",
+                [(user_id, t.carbon_offset, t.footprint, t.quiz_correct, t.quiz_wrong,
+                  t.achievements, t.responses, time.time()) for user_id, t in deltas.items()]
+            )
+            with self._flush_lock:
+                conn.execute("COMMIT")
+                self._flushing = {}
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # 放回队列，下次再写
+            with self._lock:
+                self._flushing = {}
+                self._queue[:0] = batch
+                for user_id, delta in deltas.items():
+                    pending = self._pending.setdefault(user_id, ImpactTotals())
+                    for slot in ImpactTotals.__slots__:
+                        setattr(pending, slot, getattr(pending, slot) + getattr(delta, slot))
+            raise
+        FLUSHES.observe(time.perf_counter() - started)
+        return len(batch)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+
+def public_name(user_id):
+    """Leaderboard name: session ids are credentials, so never show them"""
+    return "Bear-" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:6]
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_impact_ledger(path=None):
+    """Shared ledger for ECO_LEDGER_DB (default backend/eco_impact.db)"""
+    path = str(path or os.getenv("ECO_LEDGER_DB") or Path(__file__).parent / "eco_impact.db")
+    with _ledgers_lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            ledger = _ledgers[path] = ImpactLedger(
+                path, flush_interval=float(os.getenv("ECO_LEDGER_FLUSH_MS", "50")) / 1000)
+        return ledger
@@ -0,0 +1,73 @@
+"""zh / en detection by codepoint-range counting on the UTF-8 bytes.
+
+In UTF-8, every character from U+4000 to U+9FFF (CJK Unified Ideographs,
+most of Extension A) starts with a lead byte E4-E9 and no other byte
+does, and ASCII letters are single bytes. Both counts are therefore one
+bytes.translate() each, done in C, with no per-character Python loop.
+
+Long texts are sampled, not scanned: at most MAX_WINDOWS windows of
+WINDOW characters (head, tail, then evenly spaced through the middle),
+stopping after three windows once one script clearly dominates.
+"""
+_NOT_HAN_LEAD = bytes(b for b in range(256) if not 0xE4 <= b <= 0xE9)
+_NOT_LETTER = bytes(b for b in range(256) if not (chr(b).isascii() and chr(b).isalpha()))
+
+LETTERS_PER_HAN = 3  # 一个汉字大约抵三个英文字母的信息量
+SWITCH_SHARE = 0.6  # 新语言至少占这么多才切换；中间地带算混杂，沿用会话语言
+MIN_EVIDENCE = 1.0  # 少于一个汉字/三个字母（如答题的 "B"）不足以切换
+DECISIVE_SHARE = 0.9
+WINDOW = 256
+MAX_WINDOWS = 8
+
+
+def _count(chunk):
+    raw = chunk.encode("utf-8", "surrogatepass")
+    return len(raw.translate(None, _NOT_HAN_LEAD)), len(raw.translate(None, _NOT_LETTER))
+
+
+def _windows(length):
+    step = (length - WINDOW) / (MAX_WINDOWS - 1)
+    for k in [0, MAX_WINDOWS - 1] + list(range(1, MAX_WINDOWS - 1)):
+        start = int(k * step)
+        yield start, start + WINDOW
+
+
+def script_scores(text):
+    """(zh, en) evidence: Han characters, and Latin letters / LETTERS_PER_HAN"""
+    if len(text) <= WINDOW * MAX_WINDOWS:
+        han, letters = _count(text)
+        return han, letters / LETTERS_PER_HAN
+    han = letters = 0
+    for seen, (start, end) in enumerate(_windows(len(text)), 1):
+        window_han, window_letters = _count(text[start:end])
+        han += window_han
+        letters += window_letters
+        if seen >= 3:
+            total = han + letters / LETTERS_PER_HAN
+            if total and not (1 - DECISIVE_SHARE) * total < han < DECISIVE_SHARE * total:
+                break
+    return han, letters / LETTERS_PER_HAN
+
+
+def zh_share(text):
+    """Fraction of the evidence that is Chinese, or None if there is too little (numbers, emoji, "B")"""
+    zh, en = script_scores(text)
+    return zh / (zh + en) if zh + en >= MIN_EVIDENCE else None
+
+
+def is_mixed(text):
+    share = zh_share(text)
+    return share is not None and 1 - SWITCH_SHARE < share < SWITCH_SHARE
+
+
+def detect_language(text, current=None):
+    """'zh' or 'en'; `current` (the session's language) wins unless the text is clearly the other one"""
+    share = zh_share(text)
+    if share is None:
+        return current or "en"
+    if share >= SWITCH_SHARE:
+        return "zh"
+    if share <= 1 - SWITCH_SHARE:
+        return "en"
+    # 中英混杂（如 "Bear quiz 熊大"）：不来回跳，沿用会话语言
+    return current or ("zh" if share >= 0.5 else "en")
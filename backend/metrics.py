@@ -0,0 +1,231 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+# 默认桶（秒）：本地处理在微秒级，模型调用在秒级
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter, optionally split by one or more labels"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _labels_text(self.labels, k), v) for k, v in items]
+
+
+class Histogram:
+    """Fixed-bucket histogram: observe() is one bisect and three additions under a lock"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        """Context manager that observes the elapsed seconds of its block"""
+        return _Span(self, label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = []
+        for label_values, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                out.append((self.name + "_bucket",
+                            _labels_text(self.labels + ("le",), label_values + (le,)), cumulative))
+            out.append((self.name + "_sum", _labels_text(self.labels, label_values), series[-1]))
+            out.append((self.name + "_count", _labels_text(self.labels, label_values), cumulative))
+        return out
+
+
+class Gauge:
+    """Value read from a callback when the metrics are scraped"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read, labels=(), kind=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._read = read  # () -> {label values tuple: number}
+        if kind:
+            self.kind = kind
+
+    def samples(self):
+        return [(self.name, _labels_text(self.labels, k), v) for k, v in sorted(self._read().items())]
+
+
+class _Span:
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"❌ Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def after_fork(self):
+        """Fresh locks in a forked worker: a parent thread may have held one at fork time"""
+        for metric in self._metrics.values():
+            if hasattr(metric, '_lock'):
+                metric._lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read, labels=(), kind=None):
+        return self.register(Gauge(name, help_text, read, labels, kind))
+
+    def unregister(self, name):
+        self._metrics.pop(name, None)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "eco_stage_seconds", "Time spent in each stage of a chat turn", labels=("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "eco_request_seconds", "End-to-end time of a chat turn", labels=("kind",))
+COMMANDS = REGISTRY.counter(
+    "eco_commands_total", "Local commands answered, by handler", labels=("command",))
+MODEL_CALLS = REGISTRY.counter(
+    "eco_model_calls_total", "Model calls made (cache misses)", labels=("provider",))
+MODEL_ERRORS = REGISTRY.counter(
+    "eco_model_errors_total", "Model calls that raised", labels=("provider", "error"))
+QUIZ_ANSWERS = REGISTRY.counter(
+    "eco_quiz_answers_total", "Quiz answers, by outcome", labels=("result",))
+
+
+def register_cache(cache, registry=REGISTRY):
+    """Export a ResponseCache's hit/miss counters (read at scrape time)"""
+    registry.unregister("eco_cache_lookups_total")
+    registry.gauge(
+        "eco_cache_lookups_total", "Response cache lookups, by result",
+        lambda: {(k,): cache.stats()[k] for k in ("hits", "disk_hits", "misses")},
+        labels=("result",), kind="counter")
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds while active.
+
+    Cheap enough to switch on for a single request; report() gives the
+    hottest stacks as "outer;...;inner" strings with their sample counts.
+    """
+
+    def __init__(self, interval=0.002, thread_id=None, max_depth=30):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.max_depth = max_depth
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="eco-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def report(self, top=15):
+        total = sum(self.samples.values())
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": total,
+            "stacks": [{"stack": s, "count": n} for s, n in self.samples.most_common(top)]
+        }
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from conversation import LABELS
+
+
+class ModelError(RuntimeError):
+    """A model backend failed to answer"""
+
+
+class ModelTimeout(ModelError):
+    """The model did not answer within the timeout"""
+
+
+class ModelUnavailable(ModelError):
+    """The backend is overloaded or briefly down; worth retrying"""
+
+
+class ModelProvider:
+    """What EcoAISystem needs from a model backend: text in, text out"""
+    name = "base"
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    async def generate_async(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def stream(self, prompt):
+        """Yield the answer in chunks as they arrive"""
+        yield self.generate(prompt)
+
+    # 带对话上下文（ConversationContext）的版本；默认把上下文拼进一条提示
+    def generate_chat(self, prompt, context):
+        return self.generate(context.render(prompt))
+
+    async def generate_chat_async(self, prompt, context):
+        return await self.generate_async(context.render(prompt))
+
+    def stream_chat(self, prompt, context):
+        return self.stream(context.render(prompt))
+
+
+class GeminiProvider(ModelProvider):
+    """Google Gemini through google.generativeai"""
+    name = "gemini"
+
+    def __init__(self, api_key, model_name="gemini-2.0-flash", max_chats=1024, timeout=20.0):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.request_options = {"timeout": timeout}  # 超时后 SDK 抛 DeadlineExceeded
+        self.max_chats = max_chats
+        self._chats = OrderedDict()  # conversation id -> (ChatSession, (window start, turns))
+        self._chats_lock = threading.Lock()
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt, request_options=self.request_options).text
+
+    async def generate_async(self, prompt):
+        response = await self.model.generate_content_async(prompt, request_options=self.request_options)
+        return response.text
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=self.request_options):
+            yield chunk.text
+
+    def _chat(self, context):
+        """Reuse this conversation's ChatSession if its history is still our window, else start one"""
+        with self._chats_lock:
+            cached = self._chats.pop(context.conversation_id, None)
+        if cached is not None and cached[1] == (context.start, len(context.turns)):
+            return cached[0]
+        history = []
+        for user, bear in context.turns:
+            history.append({"role": "user", "parts": [user]})
+            history.append({"role": "model", "parts": [bear]})
+        return self.model.start_chat(history=history)
+
+    def _keep_chat(self, context, chat):
+        # 下一轮的窗口 = 这一轮的窗口 + 刚说完的这一轮（没有旧轮次被移出时）
+        with self._chats_lock:
+            self._chats[context.conversation_id] = (chat, (context.start, len(context.turns) + 1))
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+
+    def _chat_message(self, prompt, context):
+        labels = LABELS[context.lang]
+        return f"{labels['summary']}{context.summary}\n{prompt}" if context.summary else prompt
+
+    def generate_chat(self, prompt, context):
+        chat = self._chat(context)
+        answer = chat.send_message(self._chat_message(prompt, context), request_options=self.request_options).text
+        self._keep_chat(context, chat)
+        return answer
+
+    async def generate_chat_async(self, prompt, context):
+        chat = self._chat(context)
+        response = await chat.send_message_async(self._chat_message(prompt, context),
+                                                  request_options=self.request_options)
+        self._keep_chat(context, chat)
+        return response.text
+
+    def stream_chat(self, prompt, context):
+        chat = self._chat(context)
+        for chunk in chat.send_message(self._chat_message(prompt, context), stream=True,
+                                       request_options=self.request_options):
+            yield chunk.text
+        self._keep_chat(context, chat)
+
+
+class StubProvider(ModelProvider):
+    """Offline stand-in for load tests: canned answers, simulated latency and errors.
+
+    Answers depend only on the prompt; latency and errors come from a
+    seeded RNG, so a run can be repeated exactly.
+    """
+    name = "stub"
+
+    ANSWERS = {
+        "zh": [
+            "俺觉得保护森林要从身边小事做起：少用一次性筷子，多种一棵树 🌲🐻",
+            "森林是小动物的家，俺们要一起守护它！垃圾分类、节约用纸都能帮忙 🐿️",
+            "俺跟你说，一棵大树一年能吸收好多二氧化碳，可别小看它 🌳",
+        ],
+        "en": [
+            "I think protecting the forest starts small: reuse, recycle and plant a tree! 🌲🐻",
+            "Forests are home to countless animals, so every bit of paper we save helps 🐿️",
+            "I tell you, one big tree soaks up a lot of CO2 every year 🌳",
+        ],
+    }
+
+    def __init__(self, latency_ms=200.0, distribution="fixed", jitter=0.0, error_rate=0.0,
+                 chunk_size=16, chunk_delay_ms=20.0, seed=None, timeout=None):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"❌ Unknown latency distribution: {distribution}")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter  # uniform: ± ms; lognormal: sigma
+        self.error_rate = error_rate
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay_ms = chunk_delay_ms
+        self.timeout = timeout  # 秒；模拟延迟超过它时等满 timeout 再抛 ModelTimeout
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def answer(self, prompt):
+        lang = "zh" if any('\u4e00' <= char <= '\u9fff' for char in prompt[-200:]) else "en"
+        digest = hashlib.md5(prompt.encode("utf-8")).digest()
+        return self.ANSWERS[lang][digest[0] % len(self.ANSWERS[lang])]
+
+    def _draw(self):
+        """Sample (latency seconds, failure: None / "error" / "timeout") for one call"""
+        with self._lock:
+            self.calls += 1
+            if self.distribution == "uniform":
+                latency = self._rng.uniform(self.latency_ms - self.jitter, self.latency_ms + self.jitter)
+            elif self.distribution == "lognormal":
+                latency = self.latency_ms * self._rng.lognormvariate(0.0, self.jitter)
+            else:
+                latency = self.latency_ms
+            fail = self._rng.random() < self.error_rate
+        latency = max(latency, 0.0) / 1000
+        if self.timeout is not None and latency > self.timeout:
+            return self.timeout, "timeout"
+        return latency, "error" if fail else None
+
+    @staticmethod
+    def _raise(failure):
+        if failure == "timeout":
+            raise ModelTimeout("🤖❌ Stub model timed out (simulated)")
+        if failure:
+            raise ModelUnavailable("🤖❌ Stub model error (simulated)")
+
+    def _chunks(self, text):
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def generate(self, prompt):
+        latency, failure = self._draw()
+        time.sleep(latency)
+        self._raise(failure)
+        return self.answer(prompt)
+
+    async def generate_async(self, prompt):
+        latency, failure = self._draw()
+        await asyncio.sleep(latency)
+        self._raise(failure)
+        return self.answer(prompt)
+
+    def stream(self, prompt):
+        latency, failure = self._draw()
+        time.sleep(latency)  # time to first chunk
+        self._raise(failure)
+        for i, chunk in enumerate(self._chunks(self.answer(prompt))):
+            if i:
+                time.sleep(self.chunk_delay_ms / 1000)
+            yield chunk
+
+
+def create_provider(name=None):
+    """Build the model backend named by ECO_MODEL_PROVIDER (gemini or stub)"""
+    name = (name or os.getenv("ECO_MODEL_PROVIDER", "gemini")).lower()
+    if name == "gemini":
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ API key not found")
+        return GeminiProvider(api_key, os.getenv("ECO_GEMINI_MODEL", "gemini-2.0-flash"),
+                              timeout=float(os.getenv("ECO_MODEL_TIMEOUT", "20")))
+    if name == "stub":
+        seed = os.getenv("ECO_STUB_SEED")
+        return StubProvider(
+            latency_ms=float(os.getenv("ECO_STUB_LATENCY_MS", "200")),
+            distribution=os.getenv("ECO_STUB_LATENCY_DIST", "fixed"),
+            jitter=float(os.getenv("ECO_STUB_JITTER", "0")),
+            error_rate=float(os.getenv("ECO_STUB_ERROR_RATE", "0")),
+            chunk_size=int(os.getenv("ECO_STUB_CHUNK_SIZE", "16")),
+            chunk_delay_ms=float(os.getenv("ECO_STUB_CHUNK_DELAY_MS", "20")),
+            seed=int(seed) if seed else None,
+            timeout=float(os.getenv("ECO_MODEL_TIMEOUT", "20"))
+        )
+    raise ValueError(f"❌ Unknown model provider: {name}")
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalise_prompt(text):
+    """Fold case, width and punctuation so near-identical questions share a key"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+class ResponseCache:
+    """LRU + TTL cache of raw model answers, with an optional SQLite disk tier.
+
+    Only the model's text is cached; Bear's decoration (endings, tips,
+    footers) is applied afterwards, so repeated answers still vary.
+    The disk tier is pruned when it is opened and every PRUNE_EVERY puts:
+    expired rows are deleted, then the oldest beyond `max_disk_entries`.
+    """
+    PRUNE_EVERY = 256
+
+    def __init__(self, max_entries=2048, ttl=86400, path=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = str(path) if path else None
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()  # key -> (text, stored_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._puts = 0
+        if self.path:
+            conn = self._conn()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_stored ON responses(stored_at)")
+            self.prune()
+
+    def after_fork(self):
+        """A forked worker needs its own lock and SQLite connection"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(prompt_key, lang):
+        return f"{lang}:{normalise_prompt(prompt_key)}"
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        text = self._disk_get(key, now)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, text, now)
+        return text
+
+    def put(self, key, text):
+        if not self.enabled or not text:
+            return
+        now = time.time()
+        self._remember(key, text, now)
+        if self.path:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO responses (key, text, stored_at) VALUES (?, ?, ?)",
+                (self._disk_key(key), text, now)
+            )
+            with self._lock:
+                self._puts += 1
+                due = self._puts % self.PRUNE_EVERY == 0
+            if due:
+                self.prune(now)
+
+    def prune(self, now=None):
+        """Delete expired rows from the disk tier, then the oldest beyond max_disk_entries"""
+        if not self.path:
+            return 0
+        now = time.time() if now is None else now
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,)).rowcount
+        # 按写入时间保留最新的 max_disk_entries 条（走 stored_at 索引）
+        removed += conn.execute(
+            "DELETE FROM responses WHERE stored_at < ("
+            " SELECT stored_at FROM responses ORDER BY stored_at DESC LIMIT 1 OFFSET ?)",
+            (max(0, self.max_disk_entries - 1),)
+        ).rowcount
+        with self._lock:
+            self.disk_evictions += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _remember(self, key, text, stored_at):
+        with self._lock:
+            self._entries[key] = (text, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key, now):
+        if not self.path:
+            return None
+        row = self._conn().execute(
+            "SELECT text FROM responses WHERE key = ? AND stored_at >= ?",
+            (self._disk_key(key), now - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _disk_key(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+def create_response_cache():
+    """Build the response cache from ECO_CACHE_* environment variables"""
+    return ResponseCache(
+        max_entries=int(os.getenv("ECO_CACHE_SIZE", "2048")),
+        ttl=int(os.getenv("ECO_CACHE_TTL", "86400")),
+        path=os.getenv("ECO_CACHE_DB") or None,
+        max_disk_entries=int(os.getenv("ECO_CACHE_DB_SIZE", "100000"))
+    )
@@ -0,0 +1,116 @@
+"""Per-session random numbers: seedable, injectable and cheap to store.
+
+Each session draws from its own SessionRandom instead of the
+module-level random, so a session's emoticons, endings, tips and quiz
+order can be reproduced (tests, replay), and threads serving other
+users never interleave with its sequence.
+
+The stream is counter-based: block k is SHAKE-128 of (seed, k), drawn
+64 numbers at a time. The whole state is (seed, position), two integers
+saved with the session, and a reloaded session carries on exactly where
+it stopped, in any worker process.
+"""
+import hashlib
+import os
+import sys
+from array import array
+
+BATCH = 64  # 每块预取的随机数个数（32 位）
+_BLOCK_BYTES = 4 * BATCH
+_TWO_32 = 4294967296.0
+_FLOAT_SCALE = 1 / _TWO_32
+
+def session_seed(session_id=None, base=None):
+    """Seed for a new session's generator.
+
+    With a base seed (argument, else ECO_RANDOM_SEED) it is derived from
+    the base and the session id, so the same session replays the same
+    way; without one it is random.
+    """
+    if base is None:
+        base = os.getenv("ECO_RANDOM_SEED")
+    if base is None:
+        return int.from_bytes(os.urandom(8), "little")
+    digest = hashlib.blake2b(f"{base}:{session_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class SessionRandom:
+    """The subset of the random module Bear uses, drawn from (seed, position)"""
+    __slots__ = ("seed", "_block", "_index", "_batch")
+
+    def __init__(self, seed=None, position=0):
+        self.seed = seed if seed is not None else session_seed()
+        self._block = position // BATCH
+        self._index = position % BATCH  # 当前块里下一个要用的下标
+        self._batch = self._fill(self._block)
+
+    @property
+    def position(self):
+        """How many numbers have been drawn"""
+        return self._block * BATCH + self._index
+
+    def state(self):
+        """[seed, position]: everything needed to continue the sequence"""
+        return [self.seed, self.position]
+
+    def _fill(self, block):
+        batch = array("I", hashlib.shake_128(b"%d:%d" % (self.seed, block)).digest(_BLOCK_BYTES))
+        if sys.byteorder == "big":
+            batch.byteswap()  # 各平台得到同样的序列
+        return batch
+
+    def _next_block(self):
+        """First number of the next block"""
+        self._block += 1
+        self._batch = self._fill(self._block)
+        self._index = 1
+        return self._batch[0]
+
+    # 每次抽取就是取预取块里的下一个 32 位整数，块用完再生成下一块
+    def random(self):
+        """Float in [0, 1), 32 bits of resolution"""
+        index = self._index
+        if index < BATCH:
+            self._index = index + 1
+            x = self._batch[index]
+        else:
+            x = self._next_block()
+        return x * _FLOAT_SCALE
+
+    def chance(self, probability):
+        """True with the given probability; same as random() < probability"""
+        index = self._index
+        if index < BATCH:
+            self._index = index + 1
+            x = self._batch[index]
+        else:
+            x = self._next_block()
+        return x < probability * _TWO_32
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        index = self._index
+        if index < BATCH:
+            self._index = index + 1
+            x = self._batch[index]
+        else:
+            x = self._next_block()
+        return seq[x % len(seq)]
+
+    def randrange(self, start, stop=None):
+        if stop is None:
+            start, stop = 0, start
+        if stop <= start:
+            raise ValueError(f"empty range for randrange({start}, {stop})")
+        index = self._index
+        if index < BATCH:
+            self._index = index + 1
+            x = self._batch[index]
+        else:
+            x = self._next_block()
+        return start + x % (stop - start)
+
+    def __repr__(self):
+        return f"SessionRandom(seed={self.seed}, position={self.position})"
@@ -0,0 +1,452 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+
+from session_random import SessionRandom
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+# 没在答题的会话共用这一个空映射（quiz_answers 只会被整体替换，不会原地修改）
+NO_QUIZ = MappingProxyType({})
+
+
+class SessionConflict(Exception):
+    """The session was saved by another request (another worker) since this one loaded it"""
+    retry_after = 1.0
+
+    def __init__(self, session_id):
+        super().__init__("Session was updated by another request, please retry")
+        self.session_id = session_id
+
+
+class _SessionLock:
+    """A threading.Lock that can be held in a WeakValueDictionary"""
+    __slots__ = ("_lock", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+class SessionState:
+    """One user's Bear state (kept small: one instance per live session)"""
+    __slots__ = ('carbon_offset', 'interaction_count', 'quiz_answers', 'current_lang', 'last_seen',
+                 'content_cursors', 'conversation', 'rng', 'session_id', 'ledger_events')
+    # pack() 存的字段，按这个顺序；session_id 是存储的键，ledger_events 只在一次请求里有效，都不存
+    PACKED = __slots__[:-2]
+
+    def __init__(self, carbon_offset=0, interaction_count=0, quiz_answers=None,
+                 current_lang='en', last_seen=None, content_cursors=None, conversation=None,
+                 rng=None, session_id=None):
+        self.carbon_offset = carbon_offset
+        self.interaction_count = interaction_count
+        self.quiz_answers = quiz_answers or NO_QUIZ
+        self.current_lang = current_lang
+        self.last_seen = last_seen if last_seen is not None else time.time()
+        # 内容池 -> [a, b, i, n]：本会话在该池里的不重复抽样进度
+        self.content_cursors = content_cursors if content_cursors is not None else {}
+        self.conversation = conversation  # 对话记忆（ConversationMemory 管理），首次用到时创建
+        # 本会话的随机数（SessionRandom，可注入以便复现）；存储时只存 [seed, position]
+        self.rng = SessionRandom(*rng) if isinstance(rng, list) else rng
+        self.session_id = session_id  # 影响力账本按它记账；None 表示命令行用户
+        # 由 SessionStore 管理时是个列表：本次请求的账本事件，会话保存成功后才写进账本
+        self.ledger_events = None
+
+    def to_dict(self):
+        """Plain dict for the storage backends"""
+        return {slot: getattr(self, slot) for slot in self.PACKED + ('session_id',)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+    def pack(self):
+        """Compact UTF-8 record for storage: field values in PACKED order, no key names.
+
+        Bytes rather than str: a str holding one emoji is stored at 4
+        bytes per character, and conversation turns are full of them.
+        """
+        values = [getattr(self, slot) for slot in self.PACKED]
+        while values and values[-1] is None:
+            values.pop()
+        return json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=_packable).encode("utf-8")
+
+    @classmethod
+    def unpack(cls, raw):
+        """Inverse of pack(); also reads the older dict records"""
+        data = json.loads(raw)
+        state = cls.from_dict(data) if isinstance(data, dict) else cls(*data)
+        state.content_cursors = {sys.intern(pool): cursor for pool, cursor in state.content_cursors.items()}
+        return state
+
+
+def _packable(value):
+    """JSON form of the non-JSON values a session holds"""
+    if isinstance(value, SessionRandom):
+        return value.state()
+    return dict(value)  # NO_QUIZ 等只读映射
+
+
+class MemorySessionBackend:
+    """In-process backend: holds packed sessions the LRU has let go of.
+
+    Beyond `max_resident` records the least recently saved ones are
+    spilled, in batches, to a private SQLite file at `spill_path`
+    (default: one per process in the temp directory), and read back from
+    it only when their user comes back.
+    """
+    shared = False
+    SPILL_BATCH = 256
+
+    def __init__(self, max_resident=0, spill_path=None):
+        self.max_resident = max_resident  # 0 = 全部留在内存
+        self.spill_path = spill_path
+        self._data = OrderedDict()  # session_id -> (packed, version, expires_at)，最近保存的在后
+        self._spill = None
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.reloaded = 0
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        if self._spill is not None:
+            self._spill.after_fork()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._data.get(session_id)
+        if row is not None:
+            return row[0], row[1]
+        if self._spill is None:
+            return None, 0
+        data, version = self._spill.load(session_id)
+        if data is not None:
+            with self._lock:
+                self.reloaded += 1
+        return data, version
+
+    def save(self, session_id, data, expires_at, expected=None):
+        with self._lock:
+            row = self._data.get(session_id)
+            current = row[1] if row else self._spilled_version(session_id)
+            if expected is not None and current != expected:
+                raise SessionConflict(session_id)
+            self._data.pop(session_id, None)
+            version = current + 1
+            self._data[session_id] = (data, version, expires_at)
+            if self.max_resident and len(self._data) > self.max_resident:
+                # 在锁里写盘：正在转移的会话不会在内存和磁盘里都找不到
+                self._spill_oldest()
+        return version
+
+    def version(self, session_id):
+        with self._lock:
+            row = self._data.get(session_id)
+            return row[1] if row else self._spilled_version(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+            if self._spill is not None:
+                self._spill.delete(session_id)
+
+    def purge(self, now):
+        with self._lock:
+            expired = [sid for sid, row in self._data.items() if row[2] < now]
+            for sid in expired:
+                del self._data[sid]
+            if self._spill is not None:
+                return len(expired) + self._spill.purge(now)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {"resident": len(self._data), "max_resident": self.max_resident,
+                    "spilled": self.spilled, "reloaded": self.reloaded}
+
+    def _spilled_version(self, session_id):
+        return self._spill.version(session_id) if self._spill is not None else 0
+
+    def _spill_oldest(self):
+        if self._spill is None:
+            # 在第一次转移时才定路径：preload 后 fork 出的每个 worker 各用各的文件
+            path = self.spill_path or Path(tempfile.gettempdir()) / f"eco_sessions_spill_{os.getpid()}.db"
+            for stale in (f"{path}", f"{path}-wal", f"{path}-shm"):
+                if os.path.exists(stale):
+                    os.remove(stale)  # 内存后端不跨重启保留会话
+            self._spill = SQLiteSessionBackend(path)
+        # 超出的部分再多转移一批（最多上限的四分之一），刚保存的会话总留在内存里
+        count = len(self._data) - self.max_resident + min(self.SPILL_BATCH, self.max_resident // 4)
+        rows = [self._data.popitem(last=False) for _ in range(count)]
+        self._spill.store_many((sid, data, version, expires_at) for sid, (data, version, expires_at) in rows)
+        self.spilled += len(rows)
+
+
+class SQLiteSessionBackend:
+    """SQLite file backend (WAL), shared by every worker process on the host"""
+    shared = True
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires_at)")
+
+    def after_fork(self):
+        # 也不能跨进程共享：fork 出来的 worker 重新连接
+        self._local = threading.local()
+
+    def _conn(self):
+        # sqlite3 连接不能跨线程共享，每个线程一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        row = self._conn().execute(
+            "SELECT data, version, expires_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None, 0
+        if row[2] < time.time():
+            return None, row[1]  # 过期了：不给数据，但版本号照旧，保存时比对用
+        return row[0], row[1]
+
+    def save(self, session_id, data, expires_at, expected=None):
+        """Write the session; with `expected`, only if its version is still that one (compare-and-set)"""
+        conn = self._conn()
+        if expected is None:
+            row = conn.execute(
+                "INSERT INTO sessions (id, data, version, expires_at) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT(id) DO UPDATE SET data = excluded.data,"
+                " version = sessions.version + 1, expires_at = excluded.expires_at"
+                " RETURNING version",
+                (session_id, data, expires_at)
+            ).fetchone()
+        elif expected == 0:
+            # 新会话：别的请求先建了就算冲突
+            row = conn.execute(
+                "INSERT INTO sessions (id, data, version, expires_at) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT(id) DO NOTHING RETURNING version",
+                (session_id, data, expires_at)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "UPDATE sessions SET data = ?, version = version + 1, expires_at = ?"
+                " WHERE id = ? AND version = ? RETURNING version",
+                (data, expires_at, session_id, expected)
+            ).fetchone()
+        if row is None:
+            raise SessionConflict(session_id)
+        return row[0]
+
+    def store_many(self, rows):
+        """Write (id, data, version, expires_at) rows as they are, in one transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO sessions (id, data, version, expires_at) VALUES (?, ?, ?, ?)", rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def version(self, session_id):
+        row = self._conn().execute(
+            "SELECT version FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def delete(self, session_id):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self, now):
+        return self._conn().execute(
+            "DELETE FROM sessions WHERE expires_at < ?", (now,)
+        ).rowcount
+
+
+class SessionStore:
+    """LRU + TTL cache of SessionState in front of a pluggable backend"""
+
+    def __init__(self, backend=None, ttl=7200, max_entries=1024):
+        self.backend = backend or MemorySessionBackend()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lru = OrderedDict()  # session_id -> (state, version)
+        self._lru_lock = threading.Lock()
+        # 每个会话一把锁：同一用户的请求串行，不同用户互不阻塞；锁随会话空闲自动回收
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_lock = threading.Lock()
+        self._ops = 0
+
+    def after_fork(self):
+        """Fresh locks and backend connections in a forked worker"""
+        self._lru_lock = threading.Lock()
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_lock = threading.Lock()
+        self.backend.after_fork()
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def valid_id(session_id):
+        return bool(session_id) and _SESSION_ID_RE.match(session_id) is not None
+
+    def _lock_for(self, session_id):
+        with self._locks_lock:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = _SessionLock()
+            return lock
+
+    @contextmanager
+    def session(self, session_id):
+        """Hold one user's state for the duration of a request, then save it.
+
+        Only requests for the same session wait for each other. Across
+        worker processes the save is a compare-and-set: if another request
+        saved the session meanwhile, SessionConflict is raised and this
+        request's changes are dropped.
+        """
+        with self._lock_for(session_id):
+            state, version = self._load(session_id)
+            try:
+                yield state
+            finally:
+                state.last_seen = time.time()
+                self.put(session_id, state, version)
+
+    def get(self, session_id):
+        return self._load(session_id)[0]
+
+    def _load(self, session_id):
+        """(state, version it was loaded at)"""
+        now = time.time()
+        with self._lru_lock:
+            cached = self._lru.get(session_id)
+            if cached is not None:
+                self._lru.move_to_end(session_id)
+        if cached is not None:
+            state, version = cached
+            expired = now - state.last_seen > self.ttl
+            stale = self.backend.shared and self.backend.version(session_id) != version
+            if not expired and not stale:
+                state.ledger_events = []
+                return state, version
+
+        data, version = self.backend.load(session_id)
+        state = SessionState.unpack(data) if data is not None else None
+        if state is None or now - state.last_seen > self.ttl:
+            state = SessionState()  # 版本号保留：覆盖过期记录不算冲突
+        state.session_id = session_id
+        state.ledger_events = []
+        self._remember(session_id, state, version)
+        return state, version
+
+    def put(self, session_id, state, version=None):
+        """Save the state; `version` is the one it was loaded at (default: the cached one).
+
+        Impact-ledger events queued on the state are recorded only once the
+        save succeeds, so a request retried after SessionConflict is not
+        credited twice.
+        """
+        if version is None:
+            with self._lru_lock:
+                cached = self._lru.get(session_id)
+            if cached is not None and cached[0] is state:
+                version = cached[1]
+        try:
+            version = self.backend.save(session_id, state.pack(), state.last_seen + self.ttl, version)
+        except SessionConflict:
+            state.ledger_events = []  # 这次的改动作废，事件也一起丢掉
+            with self._lru_lock:
+                self._lru.pop(session_id, None)  # 下次从后端读最新的
+            raise
+        events, state.ledger_events = state.ledger_events, []
+        for ledger, user_id, kind, amount in events or ():
+            ledger.record(user_id, kind, amount)
+        self._remember(session_id, state, version)
+        self._ops += 1
+        if self._ops % 1000 == 0:
+            self.purge()
+
+    def delete(self, session_id):
+        with self._lru_lock:
+            self._lru.pop(session_id, None)
+        self.backend.delete(session_id)
+
+    def purge(self):
+        """Drop expired sessions from the LRU and the backend"""
+        now = time.time()
+        with self._lru_lock:
+            expired = [sid for sid, (state, _) in self._lru.items() if now - state.last_seen > self.ttl]
+            for sid in expired:
+                del self._lru[sid]
+        return self.backend.purge(now)
+
+    def _remember(self, session_id, state, version):
+        with self._lru_lock:
+            self._lru[session_id] = (state, version)
+            self._lru.move_to_end(session_id)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def stats(self):
+        with self._lru_lock:
+            hot = len(self._lru)
+        stats = {"hot": hot, "max_hot": self.max_entries}
+        if hasattr(self.backend, "stats"):
+            stats.update(self.backend.stats())
+        return stats
+
+    def __len__(self):
+        return len(self._lru)
+
+
+def create_session_store():
+    """Build the session store selected by ECO_SESSION_* environment variables"""
+    backend_name = os.getenv("ECO_SESSION_BACKEND", "memory").lower()
+    if backend_name == "sqlite":
+        db_path = os.getenv("ECO_SESSION_DB") or Path(__file__).parent / "eco_sessions.db"
+        backend = SQLiteSessionBackend(db_path)
+    elif backend_name == "memory":
+        # 不活跃的会话超过 ECO_SESSION_RESIDENT 个后写到本进程私有的 SQLite 文件
+        backend = MemorySessionBackend(int(os.getenv("ECO_SESSION_RESIDENT", "10000")),
+                                       os.getenv("ECO_SESSION_SPILL_DB") or None)
+    else:
+        raise ValueError(f"❌ Unknown session backend: {backend_name}")
+    return SessionStore(
+        backend=backend,
+        ttl=int(os.getenv("ECO_SESSION_TTL", "7200")),
+        max_entries=int(os.getenv("ECO_SESSION_CACHE_SIZE", "1024"))
+    )
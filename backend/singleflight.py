@@ -0,0 +1,129 @@
+"""Single-flight: concurrent calls with the same key share one execution.
+
+In class, dozens of students send the same question within seconds. The
+first caller (the leader) makes the model call; everyone who asks for
+the same key while it is running waits for it and gets the same result,
+or the same exception. Nothing is kept once the call returns, so this
+only joins calls that overlap in time; the response cache covers the
+ones that come later.
+"""
+import asyncio
+import threading
+
+from metrics import REGISTRY
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self, done):
+        self.done = done  # threading.Event or asyncio.Task
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Collapse overlapping calls per key; counts how many were collapsed"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._calls = {}  # key -> _Call (threads)
+        self._async_calls = {}  # (event loop, key) -> _Call
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.largest = 1  # 同时等同一个调用的最多请求数（含发起者）
+
+    def after_fork(self):
+        """Calls in flight in the parent have no thread to finish them here"""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def do(self, key, fn, *args):
+        """fn(*args), unless a call with this key is already running: then wait for its result"""
+        if not self.enabled:
+            return fn(*args)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call(threading.Event())
+                self.leaders += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.followers += 1
+                self.largest = max(self.largest, call.followers + 1)
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn, *args):
+        """do() for coroutine functions; waiters share the leader's result on the same event loop.
+
+        The call runs as its own task and every caller, the leader too,
+        awaits it through asyncio.shield: a caller that is cancelled
+        (client gone, timeout) stops waiting, but the call goes on for
+        the others.
+        """
+        if not self.enabled:
+            return await fn(*args)
+        loop = asyncio.get_running_loop()
+        # 单线程事件循环里不需要加锁，计数用的锁只保护和线程路径共享的计数器
+        call = self._async_calls.get((loop, key))
+        if call is not None:
+            with self._lock:
+                call.followers += 1
+                self.followers += 1
+                self.largest = max(self.largest, call.followers + 1)
+            return await asyncio.shield(call.done)
+
+        call = self._async_calls[(loop, key)] = _Call(loop.create_task(fn(*args)))
+        with self._lock:
+            self.leaders += 1
+        call.done.add_done_callback(lambda task: self._finished(loop, key, call))
+        return await asyncio.shield(call.done)
+
+    def _finished(self, loop, key, call):
+        if self._async_calls.get((loop, key)) is call:
+            del self._async_calls[(loop, key)]
+        if not call.done.cancelled():
+            call.done.exception()  # 没人等了也不报 "exception was never retrieved"
+
+    def stats(self):
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                "enabled": self.enabled,
+                "calls": calls,
+                "executed": self.leaders,
+                "coalesced": self.followers,
+                "coalesced_ratio": round(self.followers / calls, 4) if calls else 0.0,
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "largest_group": self.largest
+            }
+
+
+def register_singleflight(flights, registry=REGISTRY):
+    """Export how many model calls were made and how many joined one already running"""
+    registry.unregister("eco_model_flights_total")
+    registry.gauge(
+        "eco_model_flights_total", "Model-bound requests: executed (leader) or coalesced onto a running call",
+        lambda: {("executed",): flights.leaders, ("coalesced",): flights.followers},
+        labels=("role",), kind="counter")
@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class TriggerMatcher:
+    """Aho–Corasick automaton over every command and trigger phrase.
+
+    Built once per config; find_all() reports every phrase in one pass
+    over the (lower-cased) input, however many phrases there are.
+    """
+
+    def __init__(self, entries):
+        """entries: iterable of (phrase, payload); matching ignores case"""
+        self._goto = [{}]     # state -> {char: next state}
+        self._fail = [0]
+        self._out = [()]      # state -> ((phrase length, payload), ...)
+        self.size = 0
+        for phrase, payload in entries:
+            if isinstance(phrase, str) and phrase:
+                self._add(phrase.lower(), payload)
+        self._link()
+
+    def _add(self, phrase, payload):
+        state = 0
+        for char in phrase:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((len(phrase), payload),)
+        self.size += 1
+
+    def _link(self):
+        # 广度优先建立失败指针，并把失败链上的输出合并进来
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find_all(self, text):
+        """Return [(start, end, payload), ...] for every phrase found in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for end, char in enumerate(text.lower(), 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                matches.append((end - length, end, payload))
+        return matches
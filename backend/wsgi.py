@@ -0,0 +1,24 @@
+"""Production entry point:  cd backend && gunicorn wsgi:app
+
+Settings (workers, preload, recycling, drain) are in gunicorn.conf.py,
+which gunicorn picks up from the working directory.
+"""
+from api_server import ai_system, app, session_store
+from metrics import REGISTRY
+
+
+def after_fork():
+    """Give a freshly forked worker its own threads, locks and SQLite connections"""
+    REGISTRY.after_fork()
+    session_store.after_fork()
+    ai_system.after_fork()
+    ai_system.warm_up()  # 模型 SDK 在 fork 之后、每个进程里各自加载
+
+
+def drain():
+    """Report not-ready so the load balancer stops routing here; requests still get answered"""
+    ai_system.draining = True
+
+
+def shutdown():
+    ai_system.shutdown()